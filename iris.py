@@ -19,13 +19,26 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+import functools
+import hashlib
+import threading
+import time
+import weakref
 
+import numpy as np
+
+from tensorflow.python.eager import context
 from tensorflow.python.eager import monitoring
+from tensorflow.python.framework import constant_op
 from tensorflow.python.framework import dtypes
 from tensorflow.python.framework import ops
 from tensorflow.python.ops import array_ops
 from tensorflow.python.ops import array_ops_stack
+from tensorflow.python.ops import math_ops
+from tensorflow.python.ops import string_ops
 from tensorflow.python.ops.ragged import ragged_conversion_ops
+from tensorflow.python.ops.ragged import ragged_functional_ops
 from tensorflow.python.ops.ragged import ragged_tensor
 from tensorflow.python.ops.ragged.ragged_tensor import RaggedTensor
 from tensorflow.python.trackable import resource
@@ -40,22 +53,687 @@ _tf_text_sentencepiece_tokenizer_op_create_counter = monitoring.Counter(
     "/nlx/api/python/sentencepiece_tokenizer_create_counter",
     "Counter for number of SentencepieceTokenizers created in Python.")
 
+_tf_text_sentencepiece_tokenizer_live_gauge = monitoring.IntGauge(
+    "/nlx/api/python/sentencepiece_tokenizer_live_gauge",
+    "Number of SentencepieceTokenizers currently alive in Python.")
+
+_tf_text_sentencepiece_model_count_gauge = monitoring.IntGauge(
+    "/nlx/api/python/sentencepiece_model_count_gauge",
+    "Number of distinct Sentencepiece models currently shared in Python.")
+
+_tf_text_sentencepiece_model_bytes_gauge = monitoring.IntGauge(
+    "/nlx/api/python/sentencepiece_model_bytes_gauge",
+    "Bytes of serialized Sentencepiece models currently held in Python.")
+
+# Per-method call metrics, labelled by method name. Only recorded after
+# `enable_instrumentation()`, and only for eager calls.
+_tf_text_sentencepiece_latency_sampler = monitoring.Sampler(
+    "/nlx/api/python/sentencepiece_tokenizer_latency_us",
+    monitoring.ExponentialBuckets(1.0, 2.0, 30),
+    "Wall time of SentencepieceTokenizer calls in microseconds.", "method")
+
+_tf_text_sentencepiece_batch_size_sampler = monitoring.Sampler(
+    "/nlx/api/python/sentencepiece_tokenizer_batch_size",
+    monitoring.ExponentialBuckets(1.0, 2.0, 24),
+    "Strings per SentencepieceTokenizer call.", "method")
+
+_tf_text_sentencepiece_calls_counter = monitoring.Counter(
+    "/nlx/api/python/sentencepiece_tokenizer_calls",
+    "Number of instrumented SentencepieceTokenizer calls.", "method")
+
+_tf_text_sentencepiece_bytes_counter = monitoring.Counter(
+    "/nlx/api/python/sentencepiece_tokenizer_text_bytes",
+    "UTF-8 bytes of text passed into or out of SentencepieceTokenizer calls.",
+    "method")
+
+_tf_text_sentencepiece_tokens_counter = monitoring.Counter(
+    "/nlx/api/python/sentencepiece_tokenizer_tokens",
+    "Tokens produced or consumed by SentencepieceTokenizer calls.", "method")
+
+_INSTRUMENTED_METHODS = ("tokenize", "tokenize_with_offsets", "detokenize",
+                         "id_to_string", "string_to_id")
+# Methods whose input is text and whose output is tokens.
+_TEXT_INPUT_METHODS = ("tokenize", "tokenize_with_offsets", "string_to_id")
+
+_instrumentation_enabled = False
+# Marks an instrumented call in progress so recursive calls are not counted.
+_instrumentation_state = threading.local()
+
 
 class _SentencepieceModelResource(resource.TrackableResource):
   """Utility to track the model resource tensor (for SavedModel support)."""
 
-  def __init__(self, model, name):
+  def __init__(self, model, name, shared_name=""):
     super(_SentencepieceModelResource, self).__init__()
     self._model = model
     self._name = name
+    self._shared_name = shared_name
     _ = self.resource_handle  # Accessing this property creates the resource.
 
   def _create_resource(self):
     model, name = self._model, self._name
     with ops.name_scope(name, "SentenceTokenizerInitializer", [model]):
       # TODO(b/318839908): Switch to using a ref-counted resource instead of
-      # this kernel-owned resource.
-      return gen_sentencepiece_tokenizer.sentencepiece_op(model=model)
+      # this kernel-owned resource. Until then `shared_name` lets the kernel
+      # resource manager hand out one model per distinct proto.
+      return gen_sentencepiece_tokenizer.sentencepiece_op(
+          model=model, shared_name=self._shared_name)
+
+
+class _SentencepieceModelRegistry(object):
+  """Shares one `_SentencepieceModelResource` per distinct serialized model.
+
+  Resources are keyed by the SHA-256 of the model proto (and the graph when
+  building one) and reference counted by the tokenizers using them, so
+  creating tokenizers per request or worker parses and holds each model
+  once per process. Every tokenizer, shared or not, is counted from
+  `acquire` until its `release`.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._entries = {}
+    self._live = 0
+
+  def acquire(self, model, name):
+    """Returns `(resource, key)`; `key` is None if the model is not shared."""
+    with self._lock:
+      self._live += 1
+      _tf_text_sentencepiece_tokenizer_live_gauge.get_cell().set(self._live)
+    if isinstance(model, str):
+      model = model.encode("utf-8")
+    if not isinstance(model, bytes) or not model:
+      return (_SentencepieceModelResource(model, name), None)
+    digest = hashlib.sha256(model).hexdigest()
+    graph = None if context.executing_eagerly() else ops.get_default_graph()
+    key = (digest, graph)
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        model_resource = _SentencepieceModelResource(
+            model, name, shared_name="sentencepiece_model_" + digest)
+        entry = self._entries[key] = [model_resource, 0, len(model)]
+        self._update_gauges()
+      entry[1] += 1
+      return (entry[0], key)
+
+  def release(self, key):
+    with self._lock:
+      self._live -= 1
+      _tf_text_sentencepiece_tokenizer_live_gauge.get_cell().set(self._live)
+      entry = self._entries.get(key)
+      if entry is None:
+        return
+      entry[1] -= 1
+      if entry[1] == 0:
+        del self._entries[key]
+        self._update_gauges()
+
+  def _update_gauges(self):
+    _tf_text_sentencepiece_model_count_gauge.get_cell().set(len(self._entries))
+    _tf_text_sentencepiece_model_bytes_gauge.get_cell().set(
+        sum(entry[2] for entry in self._entries.values()))
+
+
+_model_registry = _SentencepieceModelRegistry()
+
+
+class _TokenizationCache(object):
+  """LRU cache of eager tokenization results with a byte budget.
+
+  Entries are keyed by the input string and every tokenizer option that
+  affects the output, and hold the token row as a NumPy array together with
+  its size in bytes.
+  """
+
+  def __init__(self, max_bytes):
+    self.max_bytes = max_bytes
+    self._entries = collections.OrderedDict()
+    self._bytes = 0
+    self._lock = threading.Lock()
+    self._hits = 0
+    self._misses = 0
+    self._evictions = 0
+
+  def tokenize(self, flat_input, options, out_type, tokenize_fn):
+    """Tokenizes a rank 1 eager string tensor through the cache.
+
+    Args:
+      flat_input: A rank 1 eager string `Tensor`.
+      options: Tuple of tokenizer options that is appended to each key.
+      out_type: The output dtype of `tokenize_fn`.
+      tokenize_fn: Function mapping a rank 1 string `Tensor` to
+        `(values, row_splits)`. It is called at most once, on the misses.
+
+    Returns:
+      A `RaggedTensor` with one row of tokens per input string.
+    """
+    strings = flat_input.numpy()
+    rows = [None] * len(strings)
+    missing = collections.OrderedDict()
+    with self._lock:
+      for (i, string) in enumerate(strings):
+        key = (string,) + options
+        entry = self._entries.get(key)
+        if entry is None:
+          missing.setdefault(key, []).append(i)
+        else:
+          self._entries.move_to_end(key)
+          rows[i] = entry[0]
+      n_missing = sum(len(positions) for positions in missing.values())
+      self._hits += len(strings) - n_missing
+      self._misses += n_missing
+
+    if missing:
+      # Unique misses are tokenized together in one op call.
+      (values, row_splits) = tokenize_fn(constant_op.constant(
+          [key[0] for key in missing], dtype=dtypes.string))
+      values = values.numpy()
+      row_splits = row_splits.numpy()
+      for (j, (key, positions)) in enumerate(missing.items()):
+        row = values[row_splits[j]:row_splits[j + 1]].copy()
+        for i in positions:
+          rows[i] = row
+        self._put(key, row)
+
+    row_splits = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=row_splits[1:])
+    if rows:
+      values = np.concatenate(rows)
+    else:
+      values = np.zeros([0], dtype=out_type.as_numpy_dtype)
+    return RaggedTensor.from_row_splits(
+        constant_op.constant(values, dtype=out_type),
+        constant_op.constant(row_splits),
+        validate=False)
+
+  def _put(self, key, row):
+    if row.dtype == object:
+      size = len(key[0]) + sum(len(piece) for piece in row)
+    else:
+      size = len(key[0]) + row.nbytes
+    if size > self.max_bytes:
+      return
+    with self._lock:
+      if key in self._entries:
+        return
+      self._entries[key] = (row, size)
+      self._bytes += size
+      while self._bytes > self.max_bytes:
+        (_, (_, evicted_size)) = self._entries.popitem(last=False)
+        self._bytes -= evicted_size
+        self._evictions += 1
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self._bytes = 0
+
+  def stats(self):
+    with self._lock:
+      lookups = self._hits + self._misses
+      return {
+          "hits": self._hits,
+          "misses": self._misses,
+          "evictions": self._evictions,
+          "entries": len(self._entries),
+          "bytes": self._bytes,
+          "max_bytes": self.max_bytes,
+          "hit_rate": self._hits / lookups if lookups else 0.0,
+      }
+
+
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+
+
+def _fnv1a(pieces):
+  """Vectorised 64-bit FNV-1a hashes of a fixed-width bytes (`S`) array."""
+  pieces = np.ascontiguousarray(pieces)
+  width = pieces.dtype.itemsize
+  lengths = np.char.str_len(pieces)
+  data = pieces.view(np.uint8).reshape(pieces.shape + (width,))
+  hashes = np.full(pieces.shape, _FNV_OFFSET, dtype=np.uint64)
+  for k in range(width):
+    mask = lengths > k
+    hashes[mask] = (hashes[mask] ^ data[mask, k]) * _FNV_PRIME
+  return hashes
+
+
+class SentencepieceVocabulary(object):
+  """In-memory snapshot of a Sentencepiece vocabulary for NumPy lookups.
+
+  The pieces are stored as one contiguous UTF-8 byte blob plus an offsets
+  array (`blob[offsets[i]:offsets[i + 1]]` is piece `i`), and a sorted
+  FNV-1a hash index serves the reverse lookup. Both directions are
+  vectorised NumPy and agree with `SentencepieceTokenizer.id_to_string` and
+  `string_to_id`, including mapping unknown pieces to the unknown id.
+  """
+
+  def __init__(self, blob, offsets, unk_id):
+    """Creates a vocabulary from its exported arrays.
+
+    Args:
+      blob: 1-D `uint8` array holding the concatenated pieces.
+      offsets: 1-D `int64` array of `vocab_size + 1` piece boundaries.
+      unk_id: Id returned by `string_to_id` for strings not in the vocabulary.
+    """
+    self.blob = np.asarray(blob, dtype=np.uint8)
+    self.offsets = np.asarray(offsets, dtype=np.int64)
+    self.unk_id = int(unk_id)
+    self.vocab_size = len(self.offsets) - 1
+    self._pieces = np.array(
+        [self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+         for i in range(self.vocab_size)], dtype=np.bytes_)
+    hashes = _fnv1a(self._pieces)
+    self._hash_order = np.argsort(hashes, kind="stable").astype(np.int32)
+    self._sorted_hashes = hashes[self._hash_order]
+
+  @classmethod
+  def from_pieces(cls, pieces, unk_id):
+    """Builds a vocabulary from a sequence of pieces ordered by id."""
+    encoded = [p.encode("utf-8") if isinstance(p, str) else bytes(p)
+               for p in pieces]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(p) for p in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return cls(blob, offsets, unk_id)
+
+  def save(self, path):
+    """Writes the blob, offsets and unknown id to an `.npz` file."""
+    np.savez(path, blob=self.blob, offsets=self.offsets, unk_id=self.unk_id)
+
+  @classmethod
+  def load(cls, path):
+    with np.load(path) as data:
+      return cls(data["blob"], data["offsets"], int(data["unk_id"]))
+
+  def id_to_string(self, ids):
+    """Maps an array of ids of any shape to pieces.
+
+    Args:
+      ids: Integer array-like of token ids.
+
+    Returns:
+      A NumPy bytes (`S`) array with the shape of `ids`.
+    """
+    ids = np.asarray(ids)
+    if ids.size and (ids.min() < 0 or ids.max() >= self.vocab_size):
+      raise ValueError("ids must be in [0, %d)." % self.vocab_size)
+    return self._pieces[ids]
+
+  def string_to_id(self, strings):
+    """Maps an array of pieces of any shape to ids.
+
+    Args:
+      strings: Array-like of `bytes` or `str` pieces.
+
+    Returns:
+      An `int32` NumPy array with the shape of `strings`; pieces not in the
+      vocabulary map to `unk_id`.
+    """
+    strings = np.asarray(strings)
+    if strings.dtype.kind in ("U", "O"):
+      strings = np.char.encode(strings.astype(np.str_), "utf-8")
+    hashes = _fnv1a(strings)
+    positions = np.minimum(
+        np.searchsorted(self._sorted_hashes, hashes), self.vocab_size - 1)
+    ids = self._hash_order[positions]
+    # Comparing bytes rejects queries that only share a hash with a piece.
+    found = ((self._sorted_hashes[positions] == hashes) &
+             (self._pieces[ids] == strings))
+    return np.where(found, ids, self.unk_id).astype(np.int32)
+
+
+class IncrementalDetokenizer(object):
+  """Stateful detokenizer for a batch of token streams.
+
+  Each `append` takes the newly generated ids of every stream and returns
+  only the text those ids finalised, so streaming output no longer has to
+  re-detokenize the whole growing prefix.
+
+  For every stream two offsets are kept: text up to `read` has been emitted,
+  and the window starts at `prefix`, the previous `read`. Each step
+  detokenizes `window[:read]` and the whole window in one batched op call
+  and emits the difference. Both start at the same token, so the "▁" word
+  boundary handling (including the dropped leading space) is identical and
+  the difference is exactly the new text. Text ending in U+FFFD is an
+  incomplete UTF-8 sequence from byte-fallback pieces and is held back
+  until more ids arrive or `finish` is called. The window only covers ids
+  since the last emission, so the cost per step is O(new tokens).
+  """
+
+  def __init__(self, tokenizer, batch_size=1):
+    """Creates the detokenizer.
+
+    Args:
+      tokenizer: The `SentencepieceTokenizer` whose ids are streamed. It must
+        not use `reverse=True`.
+      batch_size: Number of independent streams.
+    """
+    if tokenizer.reverse:
+      raise ValueError("Incremental detokenization requires reverse=False.")
+    if not context.executing_eagerly():
+      raise RuntimeError("IncrementalDetokenizer is only available eagerly.")
+    self._tokenizer = tokenizer
+    self.batch_size = batch_size
+    self._windows = [[] for _ in range(batch_size)]
+    self._read = [0] * batch_size
+
+  def reset(self, stream=None):
+    """Clears one stream, or all streams if `stream` is None."""
+    streams = range(self.batch_size) if stream is None else [stream]
+    for i in streams:
+      self._windows[i] = []
+      self._read[i] = 0
+
+  def append(self, new_ids):
+    """Appends ids to each stream and returns the newly finalised text.
+
+    Args:
+      new_ids: A sequence of `batch_size` sequences of int ids; streams
+        without new ids take an empty sequence.
+
+    Returns:
+      A list of `batch_size` Python strings.
+    """
+    if len(new_ids) != self.batch_size:
+      raise ValueError("Expected ids for %d streams, got %d." %
+                       (self.batch_size, len(new_ids)))
+    for (window, ids) in zip(self._windows, new_ids):
+      window.extend(int(i) for i in ids)
+    return self._emit(final=False)
+
+  def finish(self):
+    """Returns all held-back text and resets the streams."""
+    text = self._emit(final=True)
+    self.reset()
+    return text
+
+  def _emit(self, final):
+    rows = []
+    for (window, read) in zip(self._windows, self._read):
+      rows.append(window[:read])
+      rows.append(window)
+    row_splits = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=row_splits[1:])
+    values = np.fromiter(
+        (i for row in rows for i in row), dtype=np.int32, count=row_splits[-1])
+    texts = self._tokenizer.detokenize(RaggedTensor.from_row_splits(
+        constant_op.constant(values), constant_op.constant(row_splits),
+        validate=False)).numpy()
+
+    output = []
+    for i in range(self.batch_size):
+      prefix_text = texts[2 * i].decode("utf-8", errors="replace")
+      text = texts[2 * i + 1].decode("utf-8", errors="replace")
+      if len(text) > len(prefix_text) and (final or
+                                           not text.endswith(u"\ufffd")):
+        output.append(text[len(prefix_text):])
+        window = self._windows[i]
+        self._windows[i] = window[self._read[i]:]
+        self._read[i] = len(self._windows[i])
+      else:
+        output.append(u"")
+    return output
+
+
+def _flatten_strings(input_tensor):
+  """Flattens a string `Tensor` or `RaggedTensor` of any rank to rank 1.
+
+  This lets the tokenize ops run once on the flat strings instead of
+  recursing through every level of nesting.
+
+  Args:
+    input_tensor: A `Tensor` or `RaggedTensor` of strings with a statically
+      known rank.
+
+  Returns:
+    A tuple `(flat_input, restore)` where `flat_input` is a rank 1 string
+    `Tensor` and `restore` maps a `RaggedTensor` with one row per element of
+    `flat_input` back to the shape of `input_tensor` plus the ragged token
+    dimension.
+  """
+  if input_tensor.shape.ndims is None:
+    raise ValueError("Rank of input_tensor must be statically known.")
+  outer = None
+  if ragged_tensor.is_ragged(input_tensor):
+    outer = input_tensor
+    input_tensor = input_tensor.flat_values
+  rank = input_tensor.shape.ndims
+
+  if rank == 0:
+    return (array_ops.reshape(input_tensor, [1]), lambda tokens: tokens.values)
+
+  partitions = []
+  if rank > 1:
+    # Dense inner dimensions become uniform row partitions, as with
+    # `ragged_conversion_ops.from_tensor`. `nrows` is passed explicitly so
+    # zero-length dimensions keep their row count.
+    static_shape = input_tensor.shape.as_list()
+    if None in static_shape:
+      shape = array_ops.shape(input_tensor, out_type=dtypes.int64)
+      partitions = [(math_ops.reduce_prod(shape[:axis]), shape[axis])
+                    for axis in range(1, rank)]
+    else:
+      partitions = [(int(np.prod(static_shape[:axis])), static_shape[axis])
+                    for axis in range(1, rank)]
+    input_tensor = array_ops.reshape(input_tensor, [-1])
+
+  def restore(tokens):
+    for (nrows, row_length) in reversed(partitions):
+      tokens = RaggedTensor.from_uniform_row_length(
+          tokens, row_length, nrows=nrows, validate=False)
+    if outer is not None:
+      tokens = outer.with_flat_values(tokens)
+    return tokens
+
+  return (input_tensor, restore)
+
+
+def _with_partition_of(tokens, flat_values):
+  """Gives `flat_values` the (possibly absent) row partitions of `tokens`."""
+  if ragged_tensor.is_ragged(tokens):
+    return tokens.with_flat_values(flat_values)
+  return flat_values
+
+
+def _restore_shape(input_tensor, flat):
+  """Reshapes one value per flattened string back to `input_tensor`'s shape."""
+  if ragged_tensor.is_ragged(input_tensor):
+    return input_tensor.with_flat_values(array_ops.reshape(
+        flat, array_ops.shape(input_tensor.flat_values)))
+  return array_ops.reshape(flat, array_ops.shape(input_tensor))
+
+
+class SentencepieceOffsets(object):
+  """Lazy result of `SentencepieceTokenizer.tokenize_with_offsets`.
+
+  The op computes start and end offsets for every token; this object keeps
+  them only as one packed int64 `start << 32 | end` tensor, half the memory
+  of separate start and end tensors, and drops the op's two outputs. The
+  token tensor is built on first access, and start and end tensors are
+  unpacked on first access, all on one shared row partition. Unpacking as a
+  tuple still works:
+
+    tokens, starts, ends = tokenizer.tokenize_with_offsets(x, lazy=True)
+  """
+
+  def __init__(self, values, row_splits, starts, ends, restore):
+    self._values = values
+    self._row_splits = row_splits
+    self._flat_packed = (math_ops.cast(starts, dtypes.int64) * (1 << 32) +
+                         math_ops.cast(ends, dtypes.int64))
+    self._restore = restore
+    self._tokens = None
+    self._starts = None
+    self._ends = None
+
+  @property
+  def tokens(self):
+    if self._tokens is None:
+      self._tokens = self._restore(RaggedTensor.from_row_splits(
+          self._values, self._row_splits, validate=False))
+    return self._tokens
+
+  @property
+  def starts(self):
+    if self._starts is None:
+      self._starts = _with_partition_of(
+          self.tokens, math_ops.floordiv(self._flat_packed, 1 << 32))
+    return self._starts
+
+  @property
+  def ends(self):
+    if self._ends is None:
+      self._ends = _with_partition_of(
+          self.tokens, math_ops.floormod(self._flat_packed, 1 << 32))
+    return self._ends
+
+  def packed_offsets(self):
+    """Returns `start << 32 | end` per token as one int64 tensor.
+
+    The result has the shape of `tokens` and shares the packed values this
+    object holds. Use `unpack_offsets` to split it.
+    """
+    return _with_partition_of(self.tokens, self._flat_packed)
+
+  @staticmethod
+  def unpack_offsets(packed):
+    """Splits the output of `packed_offsets` into `(starts, ends)`."""
+    starts = ragged_functional_ops.map_flat_values(
+        math_ops.floordiv, packed, 1 << 32)
+    ends = ragged_functional_ops.map_flat_values(
+        math_ops.floormod, packed, 1 << 32)
+    return (starts, ends)
+
+  def __len__(self):
+    return 3
+
+  def __getitem__(self, index):
+    return (self.tokens, self.starts, self.ends)[index]
+
+  def __iter__(self):
+    yield self.tokens
+    yield self.starts
+    yield self.ends
+
+
+def enable_instrumentation(enabled=True):
+  """Turns per-method latency, batch, byte and token metrics on or off.
+
+  While disabled (the default) instrumented methods only pay for one global
+  flag check. Metrics are recorded for eager calls; calls while tracing a
+  graph are not timed since they only build ops.
+
+  Args:
+    enabled: Whether to record metrics.
+  """
+  global _instrumentation_enabled
+  _instrumentation_enabled = enabled
+
+
+def _flat_strings(value):
+  value = ragged_tensor.convert_to_tensor_or_ragged_tensor(value)
+  return value.flat_values if ragged_tensor.is_ragged(value) else value
+
+
+def _record_call(method, input, result, seconds):  # pylint: disable=redefined-builtin
+  """Records the metrics of one eager call of `method`."""
+  if method in _TEXT_INPUT_METHODS:
+    (text, tokens) = (input, result)
+  else:
+    (text, tokens) = (result, input)
+  if isinstance(tokens, SentencepieceOffsets):
+    tokens = tokens._values  # pylint: disable=protected-access
+  elif isinstance(tokens, tuple):
+    tokens = tokens[0]
+  text = _flat_strings(text)
+  tokens = _flat_strings(tokens)
+
+  _tf_text_sentencepiece_latency_sampler.get_cell(method).add(seconds * 1e6)
+  _tf_text_sentencepiece_batch_size_sampler.get_cell(method).add(
+      int(array_ops.size(text)))
+  _tf_text_sentencepiece_calls_counter.get_cell(method).increase_by(1)
+  _tf_text_sentencepiece_bytes_counter.get_cell(method).increase_by(
+      int(math_ops.reduce_sum(string_ops.string_length(text))))
+  _tf_text_sentencepiece_tokens_counter.get_cell(method).increase_by(
+      int(array_ops.size(tokens)))
+
+
+def _instrumented(method):
+  """Wraps a tokenizer method so its eager calls can be measured."""
+  method_name = method.__name__
+
+  @functools.wraps(method)
+  def wrapper(self, input, *args, **kwargs):  # pylint: disable=redefined-builtin
+    if (not _instrumentation_enabled or not context.executing_eagerly() or
+        getattr(_instrumentation_state, "active", False)):
+      return method(self, input, *args, **kwargs)
+    _instrumentation_state.active = True
+    try:
+      start = time.perf_counter()
+      result = method(self, input, *args, **kwargs)
+      elapsed = time.perf_counter() - start
+    finally:
+      _instrumentation_state.active = False
+    _record_call(method_name, input, result, elapsed)
+    return result
+
+  return wrapper
+
+
+def _histogram_percentile(histogram, quantile):
+  """Upper bucket limit below which `quantile` of the samples fall."""
+  target = quantile * histogram.num
+  seen = 0
+  for (limit, count) in zip(histogram.bucket_limit, histogram.bucket):
+    seen += count
+    if count and seen >= target:
+      return min(limit, histogram.max)
+  return histogram.max
+
+
+def dump_instrumentation(stream=None):
+  """Returns (and optionally writes) the recorded per-method metrics.
+
+  Args:
+    stream: Optional file-like object to write a one-line summary per
+      method to.
+
+  Returns:
+    A dict mapping method name to `calls`, `text_bytes`, `tokens`,
+    latency mean/p50/p90/p99 in microseconds and the mean batch size.
+  """
+  report = {}
+  for method in _INSTRUMENTED_METHODS:
+    calls = _tf_text_sentencepiece_calls_counter.get_cell(method).value()
+    if not calls:
+      continue
+    latency = _tf_text_sentencepiece_latency_sampler.get_cell(method).value()
+    batch = _tf_text_sentencepiece_batch_size_sampler.get_cell(method).value()
+    report[method] = {
+        "calls": calls,
+        "text_bytes":
+            _tf_text_sentencepiece_bytes_counter.get_cell(method).value(),
+        "tokens":
+            _tf_text_sentencepiece_tokens_counter.get_cell(method).value(),
+        "latency_us_mean": latency.sum / latency.num if latency.num else 0.0,
+        "latency_us_p50": _histogram_percentile(latency, 0.5),
+        "latency_us_p90": _histogram_percentile(latency, 0.9),
+        "latency_us_p99": _histogram_percentile(latency, 0.99),
+        "batch_size_mean": batch.sum / batch.num if batch.num else 0.0,
+    }
+  if stream is not None:
+    for (method, row) in report.items():
+      stream.write(
+          "%-22s calls=%d bytes=%d tokens=%d latency_us mean=%.1f p50<=%.0f "
+          "p90<=%.0f p99<=%.0f batch_mean=%.1f\n" %
+          (method, row["calls"], row["text_bytes"], row["tokens"],
+           row["latency_us_mean"], row["latency_us_p50"],
+           row["latency_us_p90"], row["latency_us_p99"],
+           row["batch_size_mean"]))
+  return report
 
 
 class SentencepieceTokenizer(TokenizerWithOffsets, Detokenizer):
@@ -82,7 +760,8 @@ class SentencepieceTokenizer(TokenizerWithOffsets, Detokenizer):
                add_bos=False,
                add_eos=False,
                return_nbest=False,
-               name=None):
+               name=None,
+               cache_bytes=0):
     """Creates & initializes a Sentencepiece processor.
 
     Args:
@@ -107,6 +786,10 @@ class SentencepieceTokenizer(TokenizerWithOffsets, Detokenizer):
         of a single one. The returned tensor has shape
         `[batch * nbest, (tokens)]`.
       name: The name argument that is passed to the op function.
+      cache_bytes: Byte budget for an LRU cache of eager `tokenize` results,
+        keyed by input string and tokenizer options. Only deterministic
+        configurations are cached (`nbest_size` of 0 or 1, no
+        `return_nbest`); 0 disables the cache (Default = 0).
 
     Returns:
       pieces: A SentencepieceTokenizer.
@@ -120,8 +803,13 @@ class SentencepieceTokenizer(TokenizerWithOffsets, Detokenizer):
     self.add_bos = add_bos
     self.add_eos = add_eos
     self.return_nbest = return_nbest
-    self._model_resource = _SentencepieceModelResource(model, name)
+    self._model_resource, model_key = _model_registry.acquire(model, name)
+    weakref.finalize(self, _model_registry.release, model_key)
+    self._cache = _TokenizationCache(cache_bytes) if cache_bytes > 0 else None
+    self._vocab_size = None
+    self._vocabulary = None
 
+  @_instrumented
   def tokenize(self, input, name=None):  # pylint: disable=redefined-builtin
     """Tokenizes a tensor of UTF-8 strings.
 
@@ -135,34 +823,47 @@ class SentencepieceTokenizer(TokenizerWithOffsets, Detokenizer):
     """
     with ops.name_scope(name, "SentenceTokenizer", [input, self]):
       input_tensor = ragged_tensor.convert_to_tensor_or_ragged_tensor(input)
-      if input_tensor.shape.ndims is None:
-        raise ValueError("Rank of input_tensor must be statically known.")
-      if ragged_tensor.is_ragged(input_tensor):
-        # Recursively process the values of the ragged tensor.
-        tokens = self.tokenize(input_tensor.flat_values)
-        return input_tensor.with_flat_values(tokens)
-      else:
-        if input_tensor.shape.ndims > 1:
-          # Convert the input tensor to ragged and process it.
-          return self.tokenize(ragged_conversion_ops.from_tensor(input_tensor))
-        elif input_tensor.shape.ndims == 0:
-          tokens = self.tokenize(array_ops_stack.stack([input_tensor]))
-          return tokens.values
-        else:
-          # Our rank 1 tensor is the correct shape, so we can process it as
-          # normal.
-          (output_values, row_splits) = (
-              gen_sentencepiece_tokenizer.sentencepiece_tokenize_op(
-                  self._model_resource.resource_handle, input_tensor,
-                  self.nbest_size, self.alpha, self.add_bos, self.add_eos,
-                  self.reverse, self.out_type, return_nbest=self.return_nbest))
-          tokens = RaggedTensor.from_nested_row_splits(
-              flat_values=output_values,
-              nested_row_splits=[row_splits],
-              validate=False)
-          return tokens
-
-  def tokenize_with_offsets(self, input, name=None):  # pylint: disable=redefined-builtin
+      flat_input, restore = _flatten_strings(input_tensor)
+      if self._use_cache():
+        return restore(self._cache.tokenize(
+            flat_input, self._cache_options(), dtypes.as_dtype(self.out_type),
+            self._tokenize_flat))
+      (output_values, row_splits) = self._tokenize_flat(flat_input)
+      tokens = RaggedTensor.from_row_splits(
+          output_values, row_splits, validate=False)
+      return restore(tokens)
+
+  def _tokenize_flat(self, flat_input):
+    return gen_sentencepiece_tokenizer.sentencepiece_tokenize_op(
+        self._model_resource.resource_handle, flat_input,
+        self.nbest_size, self.alpha, self.add_bos, self.add_eos,
+        self.reverse, self.out_type, return_nbest=self.return_nbest)
+
+  def _use_cache(self):
+    # Sampled tokenizations must not be memoised.
+    return (self._cache is not None and context.executing_eagerly() and
+            isinstance(self.nbest_size, int) and self.nbest_size in (0, 1) and
+            not self.return_nbest)
+
+  def _cache_options(self):
+    return (self.nbest_size, float(self.alpha), self.add_bos, self.add_eos,
+            self.reverse, dtypes.as_dtype(self.out_type))
+
+  def cache_stats(self):
+    """Returns hit/miss/eviction counts and bytes held by the result cache.
+
+    Returns:
+      A dict of cache metrics, or None if the cache is disabled.
+    """
+    return self._cache.stats() if self._cache is not None else None
+
+  def clear_cache(self):
+    """Drops all cached tokenization results."""
+    if self._cache is not None:
+      self._cache.clear()
+
+  @_instrumented
+  def tokenize_with_offsets(self, input, name=None, lazy=False):  # pylint: disable=redefined-builtin
     """Tokenizes a tensor of UTF-8 strings.
 
       This function returns a tuple containing the tokens along with
@@ -172,6 +873,9 @@ class SentencepieceTokenizer(TokenizerWithOffsets, Detokenizer):
     Args:
       input: A `RaggedTensor` or `Tensor` of UTF-8 strings with any shape.
       name: The name argument that is passed to the op function.
+      lazy: If True, return a `SentencepieceOffsets` that keeps the offsets
+        as one packed int64 tensor and builds the three tensors only when
+        they are accessed (Default = False).
 
     Returns:
       A tuple `(tokens, start_offsets, end_offsets)` where:
@@ -187,52 +891,89 @@ class SentencepieceTokenizer(TokenizerWithOffsets, Detokenizer):
     """
     with ops.name_scope(name, "SentenceTokenizer", [input, self]):
       input_tensor = ragged_tensor.convert_to_tensor_or_ragged_tensor(input)
-      if input_tensor.shape.ndims is None:
-        raise ValueError("Rank of input_tensor must be statically known.")
-      if ragged_tensor.is_ragged(input_tensor):
-        # Recursively process the values of the ragged tensor
-        (tokens, starts,
-         ends) = self.tokenize_with_offsets(input_tensor.flat_values)
-        tokens = input_tensor.with_flat_values(tokens)
-        starts = input_tensor.with_flat_values(starts)
-        ends = input_tensor.with_flat_values(ends)
-        return (tokens, starts, ends)
-      else:
-        if input_tensor.shape.ndims > 1:
-          # Convert the input tensor to ragged and process it.
-          return self.tokenize_with_offsets(
-              ragged_conversion_ops.from_tensor(input_tensor))
-        elif input_tensor.shape.ndims == 0:
-          (tokens, starts, ends) = self.tokenize_with_offsets(
-              array_ops_stack.stack([input_tensor]))
-          tokens = tokens.values
-          starts = starts.values
-          ends = ends.values
-          return (tokens, starts, ends)
-        else:
-          # Our rank 1 tensor is the correct shape, so we can process it as
-          # normal.
-          (output_values, output_splits, output_offset_starts,
-           output_offset_ends) = (
-               gen_sentencepiece_tokenizer
-               .sentencepiece_tokenize_with_offsets_op(
-                   self._model_resource.resource_handle, input_tensor,
-                   self.nbest_size, self.alpha, self.add_bos, self.add_eos,
-                   self.reverse, self.out_type, return_nbest=self.return_nbest))
-          tokens = RaggedTensor.from_nested_row_splits(
-              flat_values=output_values,
-              nested_row_splits=[output_splits],
-              validate=False)
-          starts = RaggedTensor.from_nested_row_splits(
-              flat_values=output_offset_starts,
-              nested_row_splits=[output_splits],
-              validate=False)
-          ends = RaggedTensor.from_nested_row_splits(
-              flat_values=output_offset_ends,
-              nested_row_splits=[output_splits],
-              validate=False)
-          return (tokens, starts, ends)
+      flat_input, restore = _flatten_strings(input_tensor)
+      (output_values, output_splits, output_offset_starts,
+       output_offset_ends) = (
+           gen_sentencepiece_tokenizer
+           .sentencepiece_tokenize_with_offsets_op(
+               self._model_resource.resource_handle, flat_input,
+               self.nbest_size, self.alpha, self.add_bos, self.add_eos,
+               self.reverse, self.out_type, return_nbest=self.return_nbest))
+      if lazy:
+        return SentencepieceOffsets(output_values, output_splits,
+                                    output_offset_starts, output_offset_ends,
+                                    restore)
+      tokens = restore(RaggedTensor.from_row_splits(
+          output_values, output_splits, validate=False))
+      return (tokens, _with_partition_of(tokens, output_offset_starts),
+              _with_partition_of(tokens, output_offset_ends))
+
+  def count_tokens(self, input, name=None):  # pylint: disable=redefined-builtin
+    """Counts the tokens of each string without building the token tensor.
+
+    Only the row splits of the tokenize op are used; no `RaggedTensor` of
+    tokens is created.
+
+    Args:
+      input: A `RaggedTensor` or `Tensor` of UTF-8 strings with any shape.
+      name: The name argument that is passed to the op function.
+
+    Returns:
+      An int64 `Tensor` or `RaggedTensor` with the shape of `input` holding
+      the number of tokens in each string.
+    """
+    with ops.name_scope(name, "SentencepieceTokenizerCountTokens",
+                        [input, self]):
+      input_tensor = ragged_tensor.convert_to_tensor_or_ragged_tensor(input)
+      flat_input, _ = _flatten_strings(input_tensor)
+      (_, row_splits) = self._tokenize_flat(flat_input)
+      return _restore_shape(input_tensor, row_splits[1:] - row_splits[:-1])
+
+  def truncate_to_budget(self, input, max_tokens, name=None):  # pylint: disable=redefined-builtin
+    """Truncates each string to at most `max_tokens` tokens.
+
+    Args:
+      input: A `RaggedTensor` or `Tensor` of UTF-8 strings with any shape.
+      max_tokens: Scalar token budget per string.
+      name: The name argument that is passed to the op function.
 
+    Returns:
+      A tuple `(truncated, cut_offsets, token_counts)` with the shape of
+      `input`, where:
+
+      truncated: the strings cut after their last token within the budget.
+      cut_offsets: int64 byte offset of each cut (the string length if it
+        fits the budget).
+      token_counts: int64 token count of each untruncated string.
+    """
+    with ops.name_scope(name, "SentencepieceTokenizerTruncate",
+                        [input, self]):
+      input_tensor = ragged_tensor.convert_to_tensor_or_ragged_tensor(input)
+      flat_input, _ = _flatten_strings(input_tensor)
+      (_, row_splits, _, ends) = (
+          gen_sentencepiece_tokenizer.sentencepiece_tokenize_with_offsets_op(
+              self._model_resource.resource_handle, flat_input,
+              self.nbest_size, self.alpha, self.add_bos, self.add_eos,
+              self.reverse, self.out_type, return_nbest=self.return_nbest))
+      counts = row_splits[1:] - row_splits[:-1]
+      kept = math_ops.minimum(counts, math_ops.cast(max_tokens, dtypes.int64))
+      # A leading 0 keeps the gather in range for rows with no tokens kept;
+      # index `row_start + kept` is then the end of the last kept token.
+      ends = array_ops.concat(
+          [array_ops.zeros([1], dtypes.int64),
+           math_ops.cast(ends, dtypes.int64)], axis=0)
+      last_end = array_ops.gather(ends, row_splits[:-1] + kept)
+      lengths = math_ops.cast(string_ops.string_length(flat_input), dtypes.int64)
+      cuts = array_ops.where(
+          kept < counts,
+          array_ops.where(kept > 0, last_end, array_ops.zeros_like(last_end)),
+          lengths)
+      truncated = string_ops.substr(flat_input, array_ops.zeros_like(cuts), cuts)
+      return (_restore_shape(input_tensor, truncated),
+              _restore_shape(input_tensor, cuts),
+              _restore_shape(input_tensor, counts))
+
+  @_instrumented
   def detokenize(self, input, name=None):  # pylint: disable=redefined-builtin
     """Detokenizes tokens into preprocessed text.
 
@@ -277,6 +1018,10 @@ class SentencepieceTokenizer(TokenizerWithOffsets, Detokenizer):
           tokens = self.detokenize(array_ops_stack.stack([input_tensor]))
           return array_ops.reshape(tokens, [])
 
+  def incremental_detokenizer(self, batch_size=1):
+    """Returns an `IncrementalDetokenizer` for `batch_size` token streams."""
+    return IncrementalDetokenizer(self, batch_size)
+
   def vocab_size(self, name=None):
     """Returns the vocabulary size.
 
@@ -289,10 +1034,38 @@ class SentencepieceTokenizer(TokenizerWithOffsets, Detokenizer):
     Returns:
       A scalar representing the vocabulary size.
     """
+    # The vocabulary is fixed, so eager callers get the cached Python int
+    # back as a constant instead of a kernel call.
+    if self._vocab_size is not None and context.executing_eagerly():
+      return constant_op.constant(self._vocab_size, dtype=dtypes.int32)
     with ops.name_scope(name, "SentencepieceTokenizerVocabSize", [self]):
-      return gen_sentencepiece_tokenizer.sentencepiece_vocab_size_op(
+      size = gen_sentencepiece_tokenizer.sentencepiece_vocab_size_op(
           self._model_resource.resource_handle)
+      if context.executing_eagerly():
+        self._vocab_size = int(size)
+      return size
+
+  def vocabulary(self):
+    """Returns a `SentencepieceVocabulary` snapshot for NumPy lookups.
+
+    The snapshot is built eagerly with one `id_to_string` call over all ids
+    and cached on the tokenizer.
+
+    Returns:
+      A `SentencepieceVocabulary`.
+    """
+    if self._vocabulary is None:
+      if not context.executing_eagerly():
+        raise RuntimeError("vocabulary() is only available in eager mode.")
+      size = int(self.vocab_size())
+      pieces = self.id_to_string(math_ops.range(size)).numpy()
+      # Any string that is not a piece maps to the unknown id.
+      unk_id = int(self.string_to_id(constant_op.constant(
+          b"\x00 not a sentencepiece piece \x00")))
+      self._vocabulary = SentencepieceVocabulary.from_pieces(pieces, unk_id)
+    return self._vocabulary
 
+  @_instrumented
   def id_to_string(self, input, name=None):  # pylint: disable=redefined-builtin
     """Converts vocabulary id into a token.
 
@@ -321,6 +1094,7 @@ class SentencepieceTokenizer(TokenizerWithOffsets, Detokenizer):
       return gen_sentencepiece_tokenizer.sentencepiece_id_to_string_op(
           self._model_resource.resource_handle, input)
 
+  @_instrumented
   def string_to_id(self, input, name=None):  # pylint: disable=redefined-builtin
     """Converts token into a vocabulary id.
 
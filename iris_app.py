@@ -2,16 +2,23 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext
 import threading
 import queue
+import time
 import sounddevice as sd
 import numpy as np
-from transformers import pipeline
-import openai
 import pyttsx3
 import logging
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 import torch
+from src.services.emotion_service import get_emotion_service
+from src.services.audio_frontend import AudioFrontend
+from src.services.runtime_config import create_pipeline
+from src.services.decoding import generate_kwargs
+from src.services.intent_router import IntentRouter
+from src.services.llm_router import get_llm_router, close_llm_router
+from src.services.llm_client import get_llm_client
+from src.services.echo_gate import PlaybackGate
 
 # Load environment variables
 load_dotenv()
@@ -25,39 +32,70 @@ class IrisApp:
         
         # Initialize components
         self.setup_logging()
-        self.setup_ai()
         self.setup_audio()
+        self.setup_ui_updates()
         self.create_gui()
         
+        # Load models off the UI thread so the window stays responsive
+        self.start_button.configure(state=tk.DISABLED)
+        self.set_status("Loading models...")
+        loader = threading.Thread(target=self.load_models)
+        loader.daemon = True
+        loader.start()
+        self.root.after(self.ui_poll_interval, self.process_ui_events)
+        
     def setup_logging(self):
         """Initialize logging"""
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         
+    def setup_ui_updates(self):
+        """Setup the queue worker threads use to update the GUI"""
+        self.ui_queue = queue.Queue()
+        self.ui_poll_interval = 50  # ms between queue drains
+        self.ui_batch_size = 200  # max events applied per drain
+        self.max_scrollback_lines = 2000
+        
+    def load_models(self):
+        """Initialize AI components in a background thread"""
+        try:
+            self.setup_ai()
+            self.ui_queue.put(("ready", None))
+        except Exception as e:
+            self.logger.error(f"Error loading models: {e}")
+            self.set_status("Failed to load models")
+            
     def setup_ai(self):
         """Initialize AI components"""
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.logger.info(f"Using device: {self.device}")
         
         # Initialize models
-        self.transcription_model = pipeline(
+        self.transcription_model = create_pipeline(
             "automatic-speech-recognition",
             model="openai/whisper-base",
             device=self.device
         )
         
-        self.emotion_model = pipeline(
-            "text-classification",
-            model="j-hartmann/emotion-english-distilroberta-base",
-            device=self.device
-        )
+        self.emotion_service = get_emotion_service(device=self.device)
+        
+        # Local answers for deterministic intents
+        self.intent_router = IntentRouter(on_stop=self.stop_speaking)
         
         # Initialize OpenAI
-        self.openai_client = openai.OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+        self.llm_client = get_llm_client(api_key=os.getenv("OPENAI_API_KEY"))
+        self.openai_client = self.llm_client.client
+        self.llm_router = get_llm_router()
+        
+        # Initialize TTS on its own thread; speak() only enqueues text
+        self.tts_engine = None
+        self.tts_queue = queue.Queue()
+        self.tts_thread = threading.Thread(target=self.tts_loop)
+        self.tts_thread.daemon = True
+        self.tts_thread.start()
         
-        # Initialize TTS
+    def tts_loop(self):
+        """Own the TTS engine and speak queued text in order"""
         self.tts_engine = pyttsx3.init()
         voices = self.tts_engine.getProperty('voices')
         # Set a female voice if available
@@ -68,13 +106,27 @@ class IrisApp:
         # Set speech rate
         self.tts_engine.setProperty('rate', 150)
         
+        while True:
+            text = self.tts_queue.get()
+            try:
+                self.echo_gate.playback_started()
+                self.tts_engine.say(text)
+                self.tts_engine.runAndWait()
+            except Exception as e:
+                self.logger.error(f"Error in text-to-speech: {e}")
+            finally:
+                self.echo_gate.playback_stopped()
+        
     def setup_audio(self):
         """Setup audio components"""
         self.sample_rate = 16000
         self.channels = 1
         self.chunk_duration = 0.5
         self.chunk_samples = int(self.sample_rate * self.chunk_duration)
+        self.audio_frontend = AudioFrontend(self.sample_rate)
         self.audio_queue = queue.Queue()
+        # Loud speech still passes the gate while IRIS talks, so "stop" works
+        self.echo_gate = PlaybackGate(sample_rate=self.sample_rate, barge_in_threshold=0.1)
         self.is_listening = False
         self.wake_word = "iris"
         
@@ -140,17 +192,49 @@ class IrisApp:
             self.log_message("System", "IRIS deactivated")
             
     def log_message(self, sender, message):
-        """Add message to chat display"""
+        """Queue a message for the chat display (safe from any thread)"""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.chat_display.insert(tk.END, f"[{timestamp}] {sender}: {message}\n")
-        self.chat_display.see(tk.END)
+        self.ui_queue.put(("message", f"[{timestamp}] {sender}: {message}\n"))
+        
+    def set_status(self, text):
+        """Queue a status label update (safe from any thread)"""
+        self.ui_queue.put(("status", text))
+        
+    def process_ui_events(self):
+        """Apply queued GUI updates in one batch on the Tk main loop"""
+        lines = []
+        for _ in range(self.ui_batch_size):
+            try:
+                kind, payload = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "message":
+                lines.append(payload)
+            elif kind == "status":
+                self.status_label.configure(text=payload)
+            elif kind == "ready":
+                self.start_button.configure(state=tk.NORMAL)
+                self.status_label.configure(text="IRIS is ready")
+                
+        if lines:
+            self.chat_display.insert(tk.END, "".join(lines))
+            self.trim_scrollback()
+            self.chat_display.see(tk.END)
+        self.root.after(self.ui_poll_interval, self.process_ui_events)
+        
+    def trim_scrollback(self):
+        """Drop the oldest lines beyond max_scrollback_lines"""
+        line_count = int(self.chat_display.index("end-1c").split(".")[0])
+        excess = line_count - self.max_scrollback_lines
+        if excess > 0:
+            self.chat_display.delete("1.0", f"{excess + 1}.0")
         
     def audio_callback(self, indata, frames, time, status):
         """Handle incoming audio data"""
         if status:
             self.logger.warning(f"Audio status: {status}")
         if self.is_listening:
-            self.audio_queue.put(indata.copy())
+            self.audio_queue.put(self.audio_frontend.process(indata).copy())
             
     def start_listening(self):
         """Start listening for voice input"""
@@ -184,8 +268,17 @@ class IrisApp:
         while self.is_listening:
             try:
                 audio_chunk = self.audio_queue.get()
-                # Convert audio to text
-                result = self.transcription_model({"raw": audio_chunk, "sampling_rate": self.sample_rate})
+                # Don't transcribe IRIS's own voice
+                if self.echo_gate.should_skip(audio_chunk):
+                    continue
+                # One decode per chunk: a 0.5 s chunk never fills the wake
+                # profile's token budget, so its transcript is the command too
+                start = time.monotonic()
+                result = self.transcription_model(
+                    {"raw": audio_chunk, "sampling_rate": self.sample_rate},
+                    generate_kwargs=generate_kwargs("wake")
+                )
+                self.echo_gate.record_inference(len(audio_chunk) / self.sample_rate, time.monotonic() - start)
                 text = result["text"].lower()
                 
                 # Check for wake word
@@ -199,11 +292,17 @@ class IrisApp:
     def handle_command(self, text):
         """Handle user commands"""
         try:
-            # Detect emotion
-            emotion = self.emotion_model(text)[0]
-            
-            # Generate response
-            response = self.generate_response(text, emotion["label"])
+            local = self.intent_router.route(text)
+            self.logger.info(f"Intent stats: {self.intent_router.get_stats()}")
+            if local is not None:
+                response = local["response"]
+            else:
+                # Detect emotion
+                emotion = self.emotion_service.classify(text)
+
+                # Generate response
+                response = self.generate_response(text, emotion["label"])
+            self.intent_router.remember(response)
             
             # Log response
             self.log_message("IRIS", response)
@@ -230,8 +329,7 @@ Core traits:
 
 Respond naturally and appropriately to the user's emotion."""
 
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            response = self.llm_router.complete(
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": text}
@@ -245,12 +343,18 @@ Respond naturally and appropriately to the user's emotion."""
             return "I apologize, but I'm having trouble generating a response."
             
     def speak(self, text):
-        """Convert text to speech"""
-        try:
-            self.tts_engine.say(text)
-            self.tts_engine.runAndWait()
-        except Exception as e:
-            self.logger.error(f"Error in text-to-speech: {e}")
+        """Queue text for speech without blocking the caller"""
+        self.tts_queue.put(text)
+
+    def stop_speaking(self):
+        """Drop queued speech and cut off the utterance being spoken"""
+        while True:
+            try:
+                self.tts_queue.get_nowait()
+            except queue.Empty:
+                break
+        if self.tts_engine is not None:
+            self.tts_engine.stop()
             
     def stop_listening(self):
         """Stop listening for voice input"""
@@ -263,4 +367,5 @@ Respond naturally and appropriately to the user's emotion."""
 if __name__ == "__main__":
     root = tk.Tk()
     app = IrisApp(root)
-    root.mainloop() 
\ No newline at end of file
+    root.mainloop()
+    close_llm_router()
\ No newline at end of file
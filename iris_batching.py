@@ -0,0 +1,128 @@
+# coding=utf-8
+# Copyright 2024 TF.Text Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Length-bucketed batch scheduling for `SentencepieceTokenizer`.
+
+Batches that mix one-word commands with multi-paragraph transcripts make
+the tokenize op's per-batch work and the padding of dense outputs very
+uneven. `BucketedTokenizer` sorts inputs by byte length, cuts them into
+buckets of similar length, tokenizes the buckets (optionally on several
+threads, as the op releases the GIL) and restores the input order.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from concurrent import futures
+
+import numpy as np
+import tensorflow as tf
+
+
+class BucketedTokenizer(object):
+  """Tokenizes mixed-length string batches in length buckets."""
+
+  def __init__(self,
+               tokenizer,
+               bucket_boundaries=(16, 64, 256, 1024),
+               max_batch_size=256,
+               num_threads=1):
+    """Creates the scheduler.
+
+    Args:
+      tokenizer: A `SentencepieceTokenizer`.
+      bucket_boundaries: Increasing byte lengths where buckets are cut.
+      max_batch_size: Maximum number of strings per tokenize call.
+      num_threads: Number of threads tokenizing buckets concurrently.
+    """
+    self.tokenizer = tokenizer
+    self.bucket_boundaries = list(bucket_boundaries)
+    self.max_batch_size = max_batch_size
+    self.num_threads = num_threads
+    self._executor = (futures.ThreadPoolExecutor(num_threads)
+                      if num_threads > 1 else None)
+
+  def batches(self, strings):
+    """Splits `strings` into index batches of similar byte length.
+
+    Args:
+      strings: A rank 1 string `Tensor` or a sequence of strings.
+
+    Returns:
+      A tuple `(strings, batches)` where `strings` is a rank 1 string
+      `Tensor` and `batches` is a list of int64 index arrays, shortest
+      strings first.
+    """
+    strings = tf.convert_to_tensor(strings, dtype=tf.string)
+    if strings.shape.ndims != 1:
+      raise ValueError("BucketedTokenizer expects a rank 1 batch of strings.")
+    lengths = tf.strings.length(strings).numpy()
+    order = np.argsort(lengths, kind="stable")
+    bucket_ids = np.searchsorted(self.bucket_boundaries, lengths[order],
+                                 side="right")
+    cuts = np.flatnonzero(np.diff(bucket_ids)) + 1
+    batches = []
+    for bucket in np.split(order, cuts):
+      for start in range(0, len(bucket), self.max_batch_size):
+        batches.append(bucket[start:start + self.max_batch_size])
+    return (strings, batches)
+
+  def _map(self, fn, batches):
+    if self._executor is None:
+      return [fn(batch) for batch in batches]
+    return list(self._executor.map(fn, batches))
+
+  def tokenize(self, strings):
+    """Tokenizes `strings` bucket by bucket.
+
+    Args:
+      strings: A rank 1 string `Tensor` or a sequence of strings.
+
+    Returns:
+      A `RaggedTensor` of tokens in the order of `strings`.
+    """
+    (strings, batches) = self.batches(strings)
+    if not batches:
+      return self.tokenizer.tokenize(strings)
+    parts = self._map(
+        lambda batch: self.tokenizer.tokenize(tf.gather(strings, batch)),
+        batches)
+    order = np.concatenate(batches)
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    return tf.gather(tf.concat(parts, axis=0), inverse)
+
+  def tokenize_padded(self, strings, pad_value=0):
+    """Tokenizes `strings` into one dense, minimally padded tensor per batch.
+
+    Args:
+      strings: A rank 1 string `Tensor` or a sequence of strings.
+      pad_value: Value used to pad rows to the longest row of their batch.
+
+    Returns:
+      A list of `(indices, tokens)` pairs, where `indices` are the positions
+      in `strings` of the rows of the dense `tokens` tensor.
+    """
+    (strings, batches) = self.batches(strings)
+    dense = self._map(
+        lambda batch: self.tokenizer.tokenize(
+            tf.gather(strings, batch)).to_tensor(default_value=pad_value),
+        batches)
+    return list(zip(batches, dense))
+
+  def close(self):
+    if self._executor is not None:
+      self._executor.shutdown()
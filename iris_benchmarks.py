@@ -0,0 +1,320 @@
+# coding=utf-8
+# Copyright 2024 TF.Text Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Benchmarks for the Sentencepiece tokenizer in iris.py.
+
+Usage:
+  python iris_benchmarks.py --model=/path/to/sp.model \
+      --benchmarks=SentencepieceTokenizerBenchmark.benchmark_dispatch
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import sys
+import tempfile
+import time
+
+from absl import flags
+import numpy as np
+import tensorflow as tf
+
+import iris
+import iris_batching
+import iris_corpus
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("model", None, "Path to a serialized sentencepiece model.")
+flags.DEFINE_integer("iters", 200, "Timed iterations per benchmark case.")
+flags.DEFINE_integer("burn_iters", 10, "Untimed warm-up iterations.")
+flags.DEFINE_integer("corpus_lines", 20000, "Lines in the synthetic corpus.")
+
+_SENTENCES = [
+    "hey iris what time is it",
+    "remind me to call the dentist tomorrow morning",
+    "Play some music.",
+    "What's the weather going to be like this weekend in Lisbon?",
+]
+
+
+def _legacy_tokenize(tokenizer, input):  # pylint: disable=redefined-builtin
+  """The recursive rank dispatch `tokenize` used before flattening."""
+  with tf.name_scope("SentenceTokenizer"):
+    input_tensor = tf.ragged.convert_to_tensor_or_ragged_tensor(input)
+    if isinstance(input_tensor, tf.RaggedTensor):
+      tokens = _legacy_tokenize(tokenizer, input_tensor.flat_values)
+      return input_tensor.with_flat_values(tokens)
+    if input_tensor.shape.ndims > 1:
+      return _legacy_tokenize(tokenizer, tf.RaggedTensor.from_tensor(input_tensor))
+    if input_tensor.shape.ndims == 0:
+      return _legacy_tokenize(tokenizer, tf.stack([input_tensor])).values
+    return tokenizer.tokenize(input_tensor)
+
+
+class SentencepieceTokenizerBenchmark(tf.test.Benchmark):
+  """Benchmarks for `iris.SentencepieceTokenizer`."""
+
+  def _tokenizer(self, **kwargs):
+    if not FLAGS.model:
+      raise ValueError("--model is required.")
+    with open(FLAGS.model, "rb") as f:
+      return iris.SentencepieceTokenizer(model=f.read(), **kwargs)
+
+  def _time(self, fn, *args):
+    for _ in range(FLAGS.burn_iters):
+      fn(*args)
+    start = time.perf_counter()
+    for _ in range(FLAGS.iters):
+      fn(*args)
+    return (time.perf_counter() - start) / FLAGS.iters
+
+  def _inputs(self):
+    return {
+        "scalar": tf.constant(_SENTENCES[0]),
+        "1d": tf.constant(_SENTENCES),
+        "2d_dense": tf.constant([_SENTENCES, _SENTENCES[::-1]]),
+        "ragged": tf.ragged.constant([_SENTENCES[:1], _SENTENCES[1:]]),
+    }
+
+  def benchmark_dispatch(self):
+    """Per-call overhead of flat vs. recursive rank dispatch."""
+    tokenizer = self._tokenizer()
+    for (input_name, inputs) in self._inputs().items():
+      spec = tf.type_spec_from_value(inputs)
+      variants = {
+          "flat": tokenizer.tokenize,
+          "recursive": lambda x: _legacy_tokenize(tokenizer, x),
+      }
+      for (variant, fn) in variants.items():
+        for (mode, call) in (("eager", fn),
+                             ("function", tf.function(fn, input_signature=[spec]))):
+          wall_time = self._time(call, inputs)
+          self.report_benchmark(
+              iters=FLAGS.iters,
+              wall_time=wall_time,
+              name="dispatch_%s_%s_%s" % (input_name, variant, mode))
+
+  def benchmark_cache(self):
+    """Eager tokenize of a repetitive command batch with and without cache."""
+    # 64 strings drawn from a small set, as with prompts and short commands.
+    inputs = tf.constant([_SENTENCES[i % 3] for i in range(63)] +
+                         [_SENTENCES[3]])
+    for cache_bytes in (0, 1 << 20):
+      tokenizer = self._tokenizer(cache_bytes=cache_bytes)
+      wall_time = self._time(tokenizer.tokenize, inputs)
+      extras = tokenizer.cache_stats() or {}
+      self.report_benchmark(
+          iters=FLAGS.iters,
+          wall_time=wall_time,
+          extras={k: v for (k, v) in extras.items() if k == "hit_rate"},
+          name="cache_%s" % ("on" if cache_bytes else "off"))
+
+  def benchmark_corpus(self):
+    """Streaming corpus tokenization vs. one `tokenize` call per line."""
+    tokenizer = self._tokenizer()
+    rng = np.random.RandomState(0)
+    tmp_dir = tempfile.mkdtemp()
+    corpus_path = os.path.join(tmp_dir, "corpus.txt")
+    with open(corpus_path, "w") as f:
+      for _ in range(FLAGS.corpus_lines):
+        # Mostly short commands with occasional long transcripts.
+        repeat = 1 if rng.rand() < 0.8 else rng.randint(5, 50)
+        f.write(" ".join([_SENTENCES[rng.randint(len(_SENTENCES))]] * repeat))
+        f.write("\n")
+    corpus_bytes = os.path.getsize(corpus_path)
+
+    stats = iris_corpus.tokenize_corpus(
+        tokenizer, corpus_path, os.path.join(tmp_dir, "streamed"),
+        resume=False)
+    self._report_corpus("corpus_streaming", stats["seconds"], corpus_bytes)
+
+    start = time.perf_counter()
+    with open(corpus_path, "rb") as f, \
+        open(os.path.join(tmp_dir, "naive.int32"), "wb") as out:
+      for line in f:
+        ids = tokenizer.tokenize(tf.constant(line.rstrip(b"\n")))
+        out.write(ids.numpy().astype(np.int32).tobytes())
+    self._report_corpus("corpus_per_line", time.perf_counter() - start,
+                        corpus_bytes)
+
+  def benchmark_vocabulary(self):
+    """NumPy vocabulary snapshot vs. op-based id/string lookups."""
+    tokenizer = self._tokenizer()
+    vocab = tokenizer.vocabulary()
+    ids = np.random.RandomState(0).randint(
+        0, vocab.vocab_size, size=[256, 128]).astype(np.int32)
+    pieces = tokenizer.id_to_string(ids).numpy()
+    # The snapshot must agree with the ops before timing means anything.
+    np.testing.assert_array_equal(vocab.id_to_string(ids),
+                                  pieces.astype(np.bytes_))
+    np.testing.assert_array_equal(vocab.string_to_id(pieces),
+                                  tokenizer.string_to_id(pieces).numpy())
+    cases = {
+        "id_to_string_op": lambda: tokenizer.id_to_string(ids).numpy(),
+        "id_to_string_numpy": lambda: vocab.id_to_string(ids),
+        "string_to_id_op": lambda: tokenizer.string_to_id(pieces).numpy(),
+        "string_to_id_numpy": lambda: vocab.string_to_id(pieces),
+    }
+    for (name, fn) in cases.items():
+      self.report_benchmark(
+          iters=FLAGS.iters, wall_time=self._time(fn), name="vocab_" + name)
+
+  def benchmark_incremental_detokenize(self):
+    """Token-by-token streaming: incremental vs. re-detokenizing the prefix."""
+    tokenizer = self._tokenizer()
+    text = " ".join(_SENTENCES * 16) + u" naïve café 😀"
+    ids = tokenizer.tokenize(tf.constant([text])).to_list()[0]
+    expected = tokenizer.detokenize([ids]).numpy()[0].decode("utf-8")
+
+    def incremental():
+      detokenizer = tokenizer.incremental_detokenizer()
+      pieces = [detokenizer.append([[i]])[0] for i in ids]
+      return u"".join(pieces + detokenizer.finish())
+
+    def full_prefix():
+      for n in range(1, len(ids) + 1):
+        output = tokenizer.detokenize([ids[:n]])
+      return output.numpy()[0].decode("utf-8")
+
+    # Streaming output must concatenate to the one-shot detokenization.
+    if incremental() != expected or full_prefix() != expected:
+      raise AssertionError("Streaming detokenization diverged.")
+    for (name, fn) in (("incremental", incremental),
+                       ("full_prefix", full_prefix)):
+      self.report_benchmark(
+          iters=1,
+          wall_time=self._time(fn),
+          extras={"tokens": len(ids)},
+          name="stream_detokenize_" + name)
+
+  def benchmark_lazy_offsets(self):
+    """Tuple vs. lazy `tokenize_with_offsets` when few rows need offsets.
+
+    The op computes start and end offsets in every case. `offset_bytes` is
+    the offset memory each result keeps alive: separate int64 start and end
+    tensors for the tuple, one packed int64 tensor for the lazy result,
+    which `packed_offsets` shares rather than copies.
+    """
+    tokenizer = self._tokenizer()
+    inputs = tf.constant([_SENTENCES[i % len(_SENTENCES)] * 4
+                          for i in range(1024)])
+
+    def flat_bytes(t):
+      t = t.flat_values if isinstance(t, tf.RaggedTensor) else t
+      return t.numpy().nbytes
+
+    def eager_tuple():
+      (tokens, starts, ends) = tokenizer.tokenize_with_offsets(inputs)
+      return (tokens, flat_bytes(starts) + flat_bytes(ends))
+
+    def lazy_tokens_only():
+      result = tokenizer.tokenize_with_offsets(inputs, lazy=True)
+      # pylint: disable=protected-access
+      return (result.tokens, flat_bytes(result._flat_packed))
+
+    def lazy_packed():
+      result = tokenizer.tokenize_with_offsets(inputs, lazy=True)
+      packed = result.packed_offsets()
+      return ((result.tokens, packed), flat_bytes(packed))
+
+    for (name, fn) in (("tuple", eager_tuple),
+                       ("lazy_tokens_only", lazy_tokens_only),
+                       ("lazy_packed", lazy_packed)):
+      (_, offset_bytes) = fn()
+      self.report_benchmark(
+          iters=FLAGS.iters,
+          wall_time=self._time(fn),
+          extras={"offset_bytes": offset_bytes},
+          name="offsets_" + name)
+
+  def benchmark_bucketed_batches(self):
+    """Padded tokenization of a skewed-length batch, bucketed vs. not."""
+    tokenizer = self._tokenizer()
+    rng = np.random.RandomState(0)
+    # 90% one-line commands, 10% multi-paragraph transcripts.
+    inputs = [" ".join([_SENTENCES[rng.randint(len(_SENTENCES))]] *
+                       (1 if rng.rand() < 0.9 else rng.randint(20, 200)))
+              for _ in range(2048)]
+    n_tokens = int(tf.size(tokenizer.tokenize(inputs).flat_values))
+
+    def padded_size(padded):
+      return sum(int(tf.size(tokens)) for (_, tokens) in padded)
+
+    cases = {"single_batch": lambda: [
+        (None, tokenizer.tokenize(inputs).to_tensor())]}
+    for threads in (1, 4):
+      scheduler = iris_batching.BucketedTokenizer(
+          tokenizer, num_threads=threads)
+      cases["bucketed_%d_threads" % threads] = (
+          lambda s=scheduler: s.tokenize_padded(inputs))
+    for (name, fn) in cases.items():
+      wall_time = self._time(fn)
+      self.report_benchmark(
+          iters=FLAGS.iters,
+          wall_time=wall_time,
+          extras={
+              "tokens_per_sec": n_tokens / wall_time,
+              "padding_ratio": 1.0 - n_tokens / padded_size(fn()),
+          },
+          name="batches_" + name)
+
+  def benchmark_count_tokens(self):
+    """`count_tokens` vs. `tokenize(...).row_lengths()` on 4096 prompts."""
+    tokenizer = self._tokenizer()
+    inputs = tf.constant([" ".join(_SENTENCES[:1 + i % len(_SENTENCES)])
+                          for i in range(4096)])
+    np.testing.assert_array_equal(
+        tokenizer.count_tokens(inputs).numpy(),
+        tokenizer.tokenize(inputs).row_lengths().numpy())
+    cases = {
+        "row_lengths": lambda: tokenizer.tokenize(inputs).row_lengths(),
+        "count_tokens": lambda: tokenizer.count_tokens(inputs),
+        "truncate_to_budget": lambda: tokenizer.truncate_to_budget(inputs, 8),
+    }
+    for (name, fn) in cases.items():
+      self.report_benchmark(
+          iters=FLAGS.iters, wall_time=self._time(fn), name="count_" + name)
+
+  def benchmark_instrumentation(self):
+    """`tokenize` overhead with instrumentation disabled and enabled."""
+    tokenizer = self._tokenizer()
+    inputs = tf.constant(_SENTENCES)
+    for enabled in (False, True):
+      iris.enable_instrumentation(enabled)
+      try:
+        wall_time = self._time(tokenizer.tokenize, inputs)
+      finally:
+        iris.enable_instrumentation(False)
+      self.report_benchmark(
+          iters=FLAGS.iters,
+          wall_time=wall_time,
+          name="instrumentation_%s" % ("on" if enabled else "off"))
+    iris.dump_instrumentation(sys.stdout)
+
+  def _report_corpus(self, name, seconds, corpus_bytes):
+    self.report_benchmark(
+        iters=1,
+        wall_time=seconds,
+        extras={
+            "lines_per_sec": FLAGS.corpus_lines / seconds,
+            "mb_per_sec": corpus_bytes / seconds / 1e6,
+        },
+        name=name)
+
+
+if __name__ == "__main__":
+  tf.test.main()
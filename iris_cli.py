@@ -1,15 +1,21 @@
 import threading
 import queue
+import time
 import sounddevice as sd
 import numpy as np
-from transformers import pipeline
-import openai
 import pyttsx3
 import logging
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 import torch
+from src.services.audio_frontend import AudioFrontend
+from src.services.runtime_config import create_pipeline
+from src.services.decoding import generate_kwargs
+from src.services.intent_router import IntentRouter
+from src.services.llm_router import get_llm_router, close_llm_router
+from src.services.llm_client import get_llm_client
+from src.services.echo_gate import PlaybackGate
 import signal
 import sys
 
@@ -38,18 +44,30 @@ class IrisCLI:
         self.logger.info(f"Using device: {self.device}")
         
         # Initialize models
-        self.transcription_model = pipeline(
+        self.transcription_model = create_pipeline(
             "automatic-speech-recognition",
             model="openai/whisper-base",
             device=self.device
         )
         
+        # Local answers for deterministic intents
+        self.intent_router = IntentRouter(on_stop=self.stop_speaking)
+        
         # Initialize OpenAI
-        self.openai_client = openai.OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+        self.llm_client = get_llm_client(api_key=os.getenv("OPENAI_API_KEY"))
+        self.openai_client = self.llm_client.client
+        self.llm_router = get_llm_router()
         
-        # Initialize TTS
+        # Initialize TTS on its own thread; speak() only enqueues text, so
+        # commands (including "stop") are still heard while IRIS talks
+        self.tts_engine = None
+        self.tts_queue = queue.Queue()
+        self.tts_thread = threading.Thread(target=self.tts_loop)
+        self.tts_thread.daemon = True
+        self.tts_thread.start()
+        
+    def tts_loop(self):
+        """Own the TTS engine and speak queued text in order"""
         self.tts_engine = pyttsx3.init()
         voices = self.tts_engine.getProperty('voices')
         # Set a female voice if available
@@ -60,13 +78,28 @@ class IrisCLI:
         # Set speech rate
         self.tts_engine.setProperty('rate', 150)
         
+        while True:
+            text = self.tts_queue.get()
+            try:
+                self.echo_gate.playback_started()
+                self.tts_engine.say(text)
+                self.tts_engine.runAndWait()
+            except Exception as e:
+                self.logger.error(f"Error in text-to-speech: {e}")
+            finally:
+                self.echo_gate.playback_stopped()
+                self.tts_queue.task_done()
+        
     def setup_audio(self):
         """Setup audio components"""
         self.sample_rate = 16000
         self.channels = 1
         self.chunk_duration = 0.5
         self.chunk_samples = int(self.sample_rate * self.chunk_duration)
+        self.audio_frontend = AudioFrontend(self.sample_rate)
         self.audio_queue = queue.Queue()
+        # Loud speech still passes the gate while IRIS talks, so "stop" works
+        self.echo_gate = PlaybackGate(sample_rate=self.sample_rate, barge_in_threshold=0.1)
         self.is_listening = False
         self.wake_word = "iris"
         
@@ -80,11 +113,8 @@ class IrisCLI:
         if status:
             self.logger.warning(f"Audio status: {status}")
         if self.is_listening:
-            # Ensure single channel by taking the mean if stereo
-            if indata.shape[1] > 1:
-                audio_data = np.mean(indata, axis=1)
-            else:
-                audio_data = indata[:, 0]
+            # Mono float32 at the model rate
+            audio_data = self.audio_frontend.process(indata)
             self.audio_queue.put(audio_data.copy())
             
     def start(self):
@@ -123,10 +153,17 @@ class IrisCLI:
         while self.is_listening:
             try:
                 audio_chunk = self.audio_queue.get()
-                # Reshape audio for the model
-                audio_data = audio_chunk.reshape(-1)
-                # Convert audio to text
-                result = self.transcription_model({"raw": audio_data, "sampling_rate": self.sample_rate})
+                # Don't transcribe IRIS's own voice
+                if self.echo_gate.should_skip(audio_chunk):
+                    continue
+                # One decode per chunk: a 0.5 s chunk never fills the wake
+                # profile's token budget, so its transcript is the command too
+                start = time.monotonic()
+                result = self.transcription_model(
+                    {"raw": audio_chunk, "sampling_rate": self.sample_rate},
+                    generate_kwargs=generate_kwargs("wake")
+                )
+                self.echo_gate.record_inference(len(audio_chunk) / self.sample_rate, time.monotonic() - start)
                 text = result["text"].lower()
                 
                 # Check for wake word
@@ -140,8 +177,14 @@ class IrisCLI:
     def handle_command(self, text):
         """Handle user commands"""
         try:
-            # Generate response
-            response = self.generate_response(text)
+            # Answer deterministic intents locally, otherwise ask the LLM
+            local = self.intent_router.route(text)
+            self.logger.info(f"Intent stats: {self.intent_router.get_stats()}")
+            if local is not None:
+                response = local["response"]
+            else:
+                response = self.generate_response(text)
+            self.intent_router.remember(response)
             
             # Log response
             self.log_message("IRIS", response)
@@ -167,8 +210,7 @@ Core traits:
 
 Respond naturally and helpfully to the user."""
 
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            response = self.llm_router.complete(
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": text}
@@ -182,12 +224,19 @@ Respond naturally and helpfully to the user."""
             return "I apologize, but I'm having trouble generating a response."
             
     def speak(self, text):
-        """Convert text to speech"""
-        try:
-            self.tts_engine.say(text)
-            self.tts_engine.runAndWait()
-        except Exception as e:
-            self.logger.error(f"Error in text-to-speech: {e}")
+        """Queue text for speech without blocking the caller"""
+        self.tts_queue.put(text)
+            
+    def stop_speaking(self):
+        """Drop queued speech and cut off the utterance being spoken"""
+        while True:
+            try:
+                self.tts_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.tts_queue.task_done()
+        if self.tts_engine is not None:
+            self.tts_engine.stop()
             
     def handle_exit(self, signum, frame):
         """Handle exit gracefully"""
@@ -197,6 +246,9 @@ Respond naturally and helpfully to the user."""
             self.stream.stop()
             self.stream.close()
         self.speak("Goodbye!")
+        # Let the TTS thread finish before the process exits
+        self.tts_queue.join()
+        close_llm_router()
         sys.exit(0)
 
 if __name__ == "__main__":
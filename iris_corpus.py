@@ -0,0 +1,217 @@
+# coding=utf-8
+# Copyright 2024 TF.Text Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Streaming tokenization of newline-delimited text corpora.
+
+Lines are read lazily with `tf.data`, grouped into length-bucketed batches,
+tokenized by parallel map stages and appended to a compact binary layout:
+
+  <prefix>.values.int32      Flat token ids of every tokenized line.
+  <prefix>.row_splits.int64  Row splits into the values, starting at 0.
+  <prefix>.line_ids.int64    Line number in the input of each stored row.
+  <prefix>.progress.json     Checkpoint used to resume an interrupted run.
+
+Bucketing reorders lines, so rows are stored in processing order and
+`line_ids` maps them back to input lines. All three arrays can be memory
+mapped with `TokenizedCorpus`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+_VALUES = ".values.int32"
+_ROW_SPLITS = ".row_splits.int64"
+_LINE_IDS = ".line_ids.int64"
+_PROGRESS = ".progress.json"
+
+
+def _bucket_batch_sizes(bucket_boundaries, batch_bytes):
+  """Batch size per bucket so each batch holds about `batch_bytes` of text."""
+  upper_bounds = list(bucket_boundaries) + [2 * bucket_boundaries[-1]]
+  return [max(1, batch_bytes // bound) for bound in upper_bounds]
+
+
+def _read_progress(output_prefix):
+  try:
+    with open(output_prefix + _PROGRESS) as f:
+      return json.load(f)
+  except IOError:
+    return None
+
+
+def _write_progress(output_prefix, progress):
+  # Write-then-rename so a crash never leaves a truncated checkpoint.
+  path = output_prefix + _PROGRESS
+  with open(path + ".tmp", "w") as f:
+    json.dump(progress, f)
+  os.replace(path + ".tmp", path)
+
+
+def _open_outputs(output_prefix, progress):
+  """Opens the output files for appending, rolled back to `progress`."""
+  files = {}
+  for (suffix, key) in ((_VALUES, "values"), (_ROW_SPLITS, "row_splits"),
+                        (_LINE_IDS, "line_ids")):
+    path = output_prefix + suffix
+    f = open(path, "ab" if os.path.exists(path) else "wb")
+    # Drop anything written after the last checkpoint.
+    f.truncate(progress["bytes"][key])
+    f.seek(progress["bytes"][key])
+    files[key] = f
+  if progress["bytes"]["row_splits"] == 0:
+    files["row_splits"].write(np.zeros([1], dtype=np.int64).tobytes())
+  return files
+
+
+def tokenize_corpus(tokenizer,
+                    input_paths,
+                    output_prefix,
+                    bucket_boundaries=(32, 128, 512, 2048),
+                    batch_bytes=1 << 18,
+                    shard_lines=100000,
+                    num_parallel_calls=tf.data.AUTOTUNE,
+                    resume=True):
+  """Tokenizes newline-delimited text files into a memory-mappable layout.
+
+  Work is done in shards of `shard_lines` lines. Within a shard, lines are
+  bucketed by byte length so each batch holds strings of similar size,
+  and the batches are tokenized by parallel `tf.data` map stages. A
+  checkpoint is written after every shard, so a rerun with `resume=True`
+  continues after the last completed shard.
+
+  Args:
+    tokenizer: A `SentencepieceTokenizer` with `out_type=tf.int32`.
+    input_paths: A path or list of paths to UTF-8 text files.
+    output_prefix: Path prefix of the output files.
+    bucket_boundaries: Increasing byte lengths that delimit the buckets.
+    batch_bytes: Approximate bytes of text per tokenized batch.
+    shard_lines: Lines per checkpointed shard.
+    num_parallel_calls: Parallelism of the tokenize map stage.
+    resume: Whether to continue from an existing checkpoint.
+
+  Returns:
+    A dict with the `lines`, `bytes` and `tokens` processed by this call,
+    the total `lines_done` and the elapsed `seconds`.
+  """
+  if tf.as_dtype(tokenizer.out_type) != tf.int32:
+    raise ValueError("tokenize_corpus requires a tokenizer with int32 ids.")
+  if isinstance(input_paths, str):
+    input_paths = [input_paths]
+
+  progress = _read_progress(output_prefix) if resume else None
+  if progress is None or progress["input_paths"] != list(input_paths):
+    progress = {
+        "input_paths": list(input_paths),
+        "lines_done": 0,
+        "tokens_done": 0,
+        "bytes": {"values": 0, "row_splits": 0, "line_ids": 0},
+    }
+  files = _open_outputs(output_prefix, progress)
+  batch_sizes = _bucket_batch_sizes(bucket_boundaries, batch_bytes)
+
+  def tokenize_batch(line_ids, lines):
+    tokens = tokenizer.tokenize(lines)
+    return (line_ids, tokens.flat_values, tokens.row_splits)
+
+  stats = {"lines": 0, "bytes": 0}
+  tokens_before = progress["tokens_done"]
+  start = time.perf_counter()
+  # Skipping lines only reads them; nothing before the checkpoint is
+  # tokenized again.
+  shards = (
+      tf.data.TextLineDataset(input_paths)
+      .enumerate()
+      .skip(progress["lines_done"])
+      .batch(shard_lines)
+      .prefetch(1))
+  try:
+    for (shard_ids, lines) in shards:
+      batches = (
+          tf.data.Dataset.from_tensor_slices((shard_ids, lines))
+          .bucket_by_sequence_length(
+              element_length_func=lambda _, line: tf.strings.length(line),
+              bucket_boundaries=list(bucket_boundaries),
+              bucket_batch_sizes=batch_sizes)
+          .map(tokenize_batch, num_parallel_calls=num_parallel_calls,
+               deterministic=False)
+          .prefetch(tf.data.AUTOTUNE))
+      for (line_ids, values, row_splits) in batches.as_numpy_iterator():
+        files["values"].write(values.astype(np.int32).tobytes())
+        files["row_splits"].write(
+            (row_splits[1:] + progress["tokens_done"]).astype(np.int64)
+            .tobytes())
+        files["line_ids"].write(line_ids.astype(np.int64).tobytes())
+        progress["tokens_done"] += int(row_splits[-1])
+
+      shard_bytes = int(tf.reduce_sum(tf.strings.length(lines)))
+      stats["lines"] += int(shard_ids.shape[0])
+      stats["bytes"] += shard_bytes + int(shard_ids.shape[0])
+      for f in files.values():
+        f.flush()
+        os.fsync(f.fileno())
+      progress["lines_done"] = int(shard_ids[-1]) + 1
+      progress["bytes"] = {key: f.tell() for (key, f) in files.items()}
+      _write_progress(output_prefix, progress)
+  finally:
+    for f in files.values():
+      f.close()
+
+  stats["tokens"] = progress["tokens_done"] - tokens_before
+  stats["lines_done"] = progress["lines_done"]
+  stats["seconds"] = time.perf_counter() - start
+  return stats
+
+
+class TokenizedCorpus(object):
+  """Memory-mapped view of the output of `tokenize_corpus`."""
+
+  def __init__(self, output_prefix):
+    self.values = self._map(output_prefix + _VALUES, np.int32)
+    self.row_splits = self._map(output_prefix + _ROW_SPLITS, np.int64)
+    self.line_ids = self._map(output_prefix + _LINE_IDS, np.int64)
+    self._rows_by_line = None
+
+  @staticmethod
+  def _map(path, dtype):
+    if os.path.getsize(path) == 0:
+      return np.zeros([0], dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+  def __len__(self):
+    return len(self.line_ids)
+
+  def row(self, index):
+    """Token ids of the `index`-th stored row."""
+    return self.values[self.row_splits[index]:self.row_splits[index + 1]]
+
+  def line(self, line_id):
+    """Token ids of input line `line_id`."""
+    if self._rows_by_line is None:
+      self._rows_by_line = np.empty(len(self), dtype=np.int64)
+      self._rows_by_line[self.line_ids] = np.arange(len(self))
+    return self.row(self._rows_by_line[line_id])
+
+  def to_ragged(self):
+    """All rows, in stored order, as a `tf.RaggedTensor`."""
+    return tf.RaggedTensor.from_row_splits(
+        np.asarray(self.values), np.asarray(self.row_splits), validate=False)
@@ -0,0 +1,171 @@
+# coding=utf-8
+# Copyright 2024 TF.Text Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the incremental detokenizer and lazy offsets in iris.py.
+
+The default model, test_data/iris_test_model.model, is a tiny unigram model
+with byte fallback trained on ASCII text only, so every non-ASCII character
+streams as byte pieces. Set `IRIS_SP_MODEL` to run against another model;
+the byte-fallback cases are skipped for models trained without byte pieces.
+The whole module is skipped where TensorFlow is not installed.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+pytest.importorskip("tensorflow_text")
+
+from absl.testing import parameterized  # pylint: disable=g-import-not-at-top
+from tensorflow.python.platform import resource_loader  # pylint: disable=g-import-not-at-top
+
+import iris  # pylint: disable=g-import-not-at-top
+
+_MODEL_PATH = os.environ.get("IRIS_SP_MODEL") or (
+    resource_loader.get_path_to_datafile("test_data/iris_test_model.model"))
+
+
+class IncrementalDetokenizerTest(tf.test.TestCase, parameterized.TestCase):
+
+  def setUp(self):
+    super(IncrementalDetokenizerTest, self).setUp()
+    with open(_MODEL_PATH, "rb") as f:
+      self.model = f.read()
+    self.tokenizer = iris.SentencepieceTokenizer(model=self.model)
+
+  def _ids(self, text):
+    return self.tokenizer.tokenize(tf.constant([text])).to_list()[0]
+
+  def _one_shot(self, ids):
+    text = self.tokenizer.detokenize(tf.ragged.constant([ids], dtype=tf.int32))
+    return text.numpy()[0].decode("utf-8", errors="replace")
+
+  def _stream(self, ids, chunk_size=1):
+    detokenizer = self.tokenizer.incremental_detokenizer()
+    pieces = [detokenizer.append([ids[i:i + chunk_size]])[0]
+              for i in range(0, len(ids), chunk_size)]
+    return pieces + detokenizer.finish()
+
+  def _byte_fallback_ids(self, text):
+    pieces = ["<0x%02X>" % b for b in bytearray(text.encode("utf-8"))]
+    vocabulary = self.tokenizer.vocabulary()
+    ids = vocabulary.string_to_id(pieces).tolist()
+    if vocabulary.unk_id in ids:
+      self.skipTest("Model has no byte-fallback pieces.")
+    return ids
+
+  @parameterized.parameters(1, 2, 3, 7)
+  def testMultiByteUtf8(self, chunk_size):
+    ids = self._ids(u"naïve café — 😀 日本語 Ünïcödé")
+    expected = self._one_shot(ids)
+    pieces = self._stream(ids, chunk_size)
+    self.assertEqual(u"".join(pieces), expected)
+    if u"\ufffd" not in expected:
+      for piece in pieces:
+        self.assertNotIn(u"\ufffd", piece)
+
+  def testByteFallbackHeldBackUntilComplete(self):
+    emoji_ids = self._byte_fallback_ids(u"😀")
+    ids = self._ids(u"hi") + emoji_ids + self._ids(u"there")
+    pieces = self._stream(ids)
+    self.assertEqual(u"".join(pieces), self._one_shot(ids))
+    first = len(self._ids(u"hi"))
+    # The leading bytes of the emoji decode to nothing until the last one.
+    self.assertEqual(pieces[first:first + len(emoji_ids) - 1],
+                     [u""] * (len(emoji_ids) - 1))
+    self.assertEqual(pieces[first + len(emoji_ids) - 1], u"😀")
+
+  def testFinishFlushesIncompleteSequence(self):
+    ids = self._byte_fallback_ids(u"😀")[:2]
+    detokenizer = self.tokenizer.incremental_detokenizer()
+    self.assertEqual([detokenizer.append([[i]])[0] for i in ids], [u"", u""])
+    self.assertEqual(detokenizer.finish(), [self._one_shot(ids)])
+
+  @parameterized.parameters(1, 2, 5)
+  def testWordBoundaries(self, chunk_size):
+    ids = self._ids(u"the quick  brown fox jumps over the lazy dog")
+    expected = self._one_shot(ids)
+    pieces = self._stream(ids, chunk_size)
+    self.assertEqual(u"".join(pieces), expected)
+    # The "▁" of the first word is dropped, as in one-shot detokenization.
+    self.assertFalse(u"".join(pieces).startswith(u" "))
+
+  def testWindowOnlyCoversUnemittedIds(self):
+    ids = self._ids(u" ".join([u"the quick brown fox 😀"] * 20))
+    detokenizer = self.tokenizer.incremental_detokenizer()
+    text = u""
+    longest = 0
+    for i in ids:
+      text += detokenizer.append([[i]])[0]
+      # pylint: disable=protected-access
+      longest = max(longest, len(detokenizer._windows[0]))
+    text += detokenizer.finish()[0]
+    self.assertEqual(text, self._one_shot(ids))
+    # The last emitted id plus at most three held-back bytes.
+    self.assertLessEqual(longest, 4)
+
+  def testIndependentStreams(self):
+    texts = [u"turn the lights off", u"¿qué hora es? 🙂", u"ok"]
+    ids = [self._ids(text) for text in texts]
+    detokenizer = self.tokenizer.incremental_detokenizer(len(texts))
+    outputs = [u""] * len(texts)
+    steps = max(len(row) for row in ids)
+    for step in range(0, steps, 2):
+      for (i, text) in enumerate(detokenizer.append(
+          [row[step:step + 2] for row in ids])):
+        outputs[i] += text
+    for (i, text) in enumerate(detokenizer.finish()):
+      outputs[i] += text
+    self.assertEqual(outputs, [self._one_shot(row) for row in ids])
+
+  def testResetStartsANewStream(self):
+    detokenizer = self.tokenizer.incremental_detokenizer()
+    detokenizer.append([self._ids(u"first message")])
+    detokenizer.reset()
+    ids = self._ids(u"second")
+    text = detokenizer.append([ids])[0] + detokenizer.finish()[0]
+    self.assertEqual(text, self._one_shot(ids))
+
+  def testReverseIsRejected(self):
+    tokenizer = iris.SentencepieceTokenizer(model=self.model, reverse=True)
+    with self.assertRaises(ValueError):
+      tokenizer.incremental_detokenizer()
+
+
+class LazyOffsetsTest(tf.test.TestCase):
+
+  def testLazyOffsetsMatchTuple(self):
+    with open(_MODEL_PATH, "rb") as f:
+      tokenizer = iris.SentencepieceTokenizer(model=f.read())
+    inputs = tf.ragged.constant([[u"the quick brown fox", u"naïve café"],
+                                 [u"ok"]])
+    (tokens, starts, ends) = tokenizer.tokenize_with_offsets(inputs)
+    result = tokenizer.tokenize_with_offsets(inputs, lazy=True)
+    self.assertAllEqual(result.tokens, tokens)
+    self.assertAllEqual(result.starts, starts)
+    self.assertAllEqual(result.ends, ends)
+    (unpacked_starts, unpacked_ends) = iris.SentencepieceOffsets.unpack_offsets(
+        result.packed_offsets())
+    self.assertAllEqual(unpacked_starts, starts)
+    self.assertAllEqual(unpacked_ends, ends)
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -1,11 +1,9 @@
 import torch
 import numpy as np
 import sounddevice as sd
-from transformers import pipeline
 import json
 import os
 from typing import Dict, List, Optional, Callable
-import openai
 from pydantic import BaseModel
 import threading
 import queue
@@ -19,6 +17,16 @@ import aiohttp
 import asyncio
 from dotenv import load_dotenv
 import sys
+from .emotion_service import get_emotion_service
+from .endpointing import Endpointer
+from .audio_frontend import AudioFrontend
+from .intent_router import IntentRouter
+from .speculation import SpeculativeResponder
+from .llm_router import get_llm_router, close_llm_router
+from .llm_client import get_llm_client
+from .runtime_config import create_pipeline, inference_mode
+from .decoding import generate_kwargs
+from .feature_cache import FeatureCache, HOP_LENGTH, compute_log_mel, normalize_log_mel
 
 # Load environment variables
 load_dotenv()
@@ -41,22 +49,38 @@ class AdvancedAIService:
             if not openai_key:
                 raise ValueError("OPENAI_API_KEY not found in environment variables")
             
-            self.openai_client = openai.OpenAI(api_key=openai_key)
+            self.llm_client = get_llm_client(api_key=openai_key)
+            self.openai_client = self.llm_client.client
+            self.llm_router = get_llm_router()
             
             # Initialize transcription pipeline
-            self.transcription_pipeline = pipeline(
+            self.transcription_pipeline = create_pipeline(
                 "automatic-speech-recognition",
                 model="openai/whisper-base",
                 device=self.device
             )
+            # Decoding profile for commands (and speculative partials, which
+            # must decode the same way to match the final transcript)
+            self.command_profile = os.getenv("IRIS_COMMAND_PROFILE", "command")
             
-            # Initialize Emotion Recognition
-            self.emotion_classifier = pipeline(
-                "text-classification",
-                model="j-hartmann/emotion-english-distilroberta-base",
-                device=self.device
-            )
+            # Initialize Emotion Recognition (shared, batched and cached)
+            self.emotion_service = get_emotion_service(device=self.device)
             
+            # Local answers for deterministic intents (time, date, stop, ...)
+            self.intent_router = IntentRouter(handlers={
+                "time": lambda text: f"It's {self.get_current_time()}, {self.owner_name}.",
+                "date": lambda text: f"Today is {self.get_current_date()}, {self.owner_name}.",
+                "timezone": lambda text: f"Your time zone is {self.get_current_timezone()}.",
+            }, on_stop=self.stop_speaking)
+
+            # Speculative LLM requests on stable partial transcripts (opt-in:
+            # costs a partial Whisper pass per chunk and some wasted tokens)
+            self.speculative_llm = os.getenv("IRIS_SPECULATIVE_LLM", "false").lower() in ("1", "true", "yes")
+            self.speculator = SpeculativeResponder(
+                self.generate_speculative_response,
+                stability_interval=float(os.getenv("IRIS_SPECULATION_INTERVAL", "0.6"))
+            )
+
             # User Identity and Settings
             self.owner_name = "Khalil"
             self.loyalty_level = "absolute"
@@ -67,6 +91,15 @@ class AdvancedAIService:
             self.dtype = np.float32
             self.chunk_duration = 0.5
             self.chunk_samples = int(self.sample_rate * self.chunk_duration)
+            self.audio_frontend = AudioFrontend(self.sample_rate)
+
+            # Log-mel frames computed once per chunk and shared by VAD,
+            # wake-word spotting and command transcription
+            self.feature_cache = FeatureCache(
+                mel_filters=np.asarray(self.transcription_pipeline.feature_extractor.mel_filters, dtype=np.float32),
+                sample_rate=self.sample_rate
+            )
+            self.frames_per_second = self.sample_rate // HOP_LENGTH
             
             # Enhanced listening settings
             self.audio_queue = queue.Queue()
@@ -74,7 +107,20 @@ class AdvancedAIService:
             self.audio_buffer = deque(maxlen=int(3 * self.sample_rate))
             self.wake_word = "iris"
             self.wake_word_threshold = 0.1
+            self.wake_window_frames = 3 * self.frames_per_second
+            self.wake_search_start = 0
+            self.max_command_duration = 10  # seconds
+            self.endpointer = Endpointer(
+                sample_rate=self.sample_rate,
+                frame_ms=1000.0 / self.frames_per_second,
+                max_duration=self.max_command_duration
+            )
+            self.last_endpoint_trace: Optional[Dict] = None
+            self.last_command_frames: Optional[tuple] = None
             
+            # Engine of the utterance being spoken, so "stop" can cut it off
+            self.tts_engine = None
+
             # Initialize session
             self.session = None
             
@@ -101,7 +147,11 @@ class AdvancedAIService:
                 import pyttsx3
                 engine = pyttsx3.init()
                 engine.say(text)
-                engine.runAndWait()
+                self.tts_engine = engine
+                try:
+                    engine.runAndWait()
+                finally:
+                    self.tts_engine = None
                 return True
             else:
                 logger.info(f"TTS (text only): {text}")
@@ -110,6 +160,13 @@ class AdvancedAIService:
             logger.error(f"TTS error: {str(e)}")
             return False
 
+    def stop_speaking(self):
+        """Cut off current speech and drop any in-flight speculative request"""
+        engine = self.tts_engine
+        if engine is not None:
+            engine.stop()
+        self.speculator.reset()
+
     async def get_internet_info(self, query: str) -> str:
         """Get real-time information from the internet"""
         try:
@@ -126,20 +183,60 @@ class AdvancedAIService:
 
     def detect_wake_word(self, audio_data: np.ndarray) -> bool:
         """Detect wake word in audio using energy-based detection first"""
+        return self.locate_wake_word(audio_data) is not None
+
+    def locate_wake_word(self, audio_data: np.ndarray) -> Optional[int]:
+        """Return the sample offset just after the wake word, or None if absent"""
+        # First check audio energy level
+        energy = np.mean(np.abs(audio_data))
+        if energy < self.wake_word_threshold:
+            return None
+        log_mel = compute_log_mel(audio_data, self.feature_cache.mel_filters)
+        frame = self.locate_wake_word_in_features(log_mel)
+        if frame is None:
+            return None
+        return min(len(audio_data), frame * HOP_LENGTH)
+
+    def locate_wake_word_in_features(self, log_mel: np.ndarray) -> Optional[int]:
+        """Return the frame just after the wake word in raw log-mel frames"""
         try:
-            # First check audio energy level
-            energy = np.mean(np.abs(audio_data))
-            if energy < self.wake_word_threshold:
-                return False
+            # Token timestamps tell us where the wake word ends so the rest of
+            # the window can seed the command
+            outputs = self.generate_from_features(log_mel, profile="wake", token_timestamps=True)
+            tokens = outputs["sequences"][0].tolist()
+            times = outputs["token_timestamps"][0].tolist()
+            tokenizer = self.transcription_pipeline.tokenizer
+            special_ids = set(tokenizer.all_special_ids)
 
-            # Only use Whisper if energy threshold is met
-            result = self.transcription_pipeline({"raw": audio_data, "sampling_rate": self.sample_rate})
-            transcription = result["text"].lower()
-            return self.wake_word in transcription
+            text = ""
+            for i, token in enumerate(tokens):
+                if token in special_ids:
+                    continue
+                text += tokenizer.decode([token])
+                if self.wake_word in text.lower():
+                    end_time = times[i + 1] if i + 1 < len(times) else times[i]
+                    return min(len(log_mel), int(end_time * self.frames_per_second))
+            return None
 
         except Exception as e:
             logger.error(f"Wake word detection error: {str(e)}")
-            return False
+            return None
+
+    def generate_from_features(self, log_mel: np.ndarray, profile: Optional[str] = None,
+                               token_timestamps: bool = False):
+        """Run Whisper generation on cached raw log-mel frames"""
+        model = self.transcription_pipeline.model
+        input_features = torch.from_numpy(normalize_log_mel(log_mel)[None]).to(model.device, dtype=model.dtype)
+        kwargs = generate_kwargs(profile or self.command_profile)
+        with inference_mode():
+            if token_timestamps:
+                return model.generate(input_features, return_token_timestamps=True, **kwargs)
+            return model.generate(input_features, **kwargs)
+
+    def transcribe_features(self, log_mel: np.ndarray, profile: Optional[str] = None) -> str:
+        """Transcribe cached raw log-mel frames without recomputing features"""
+        sequences = self.generate_from_features(log_mel, profile)
+        return self.transcription_pipeline.tokenizer.batch_decode(sequences, skip_special_tokens=True)[0]
 
     # Time-related utilities
     def get_time_info(self, format_str: str) -> str:
@@ -168,6 +265,8 @@ class AdvancedAIService:
             if self.session:
                 await self.session.close()
             self.stop_listening()
+            self.speculator.shutdown()
+            close_llm_router()
         except Exception as e:
             logger.error(f"Cleanup error: {str(e)}")
 
@@ -179,20 +278,31 @@ class AdvancedAIService:
         except Exception as e:
             logger.error(f"Destructor cleanup error: {str(e)}")
 
-    def transcribe_audio(self, audio_data):
-        """Transcribe audio to text"""
+    def transcribe_audio(self, audio_data, profile: Optional[str] = None):
+        """Transcribe audio to text with a named decoding profile"""
         try:
-            result = self.transcription_pipeline({"raw": audio_data, "sampling_rate": 16000})
+            result = self.transcription_pipeline(
+                {"raw": audio_data, "sampling_rate": 16000},
+                generate_kwargs=generate_kwargs(profile or self.command_profile)
+            )
             return result["text"]
         except Exception as e:
             logging.error(f"Error in transcription: {e}")
             return None
 
-    def generate_response(self, text: str, emotion: str = "") -> str:
-        """Generate AI response with enhanced loyalty and internet access"""
+    def generate_speculative_response(self, text: str, usage: Dict) -> str:
+        """Emotion + response for a partial transcript, run by the speculator"""
+        emotion = self.emotion_service.classify(text)
+        return self.generate_response(text, emotion["label"], usage=usage)
+
+    def generate_response(self, text: str, emotion: str = "", usage: Optional[Dict] = None) -> str:
+        """Generate AI response with enhanced loyalty and internet access
+
+        If ``usage`` is given it receives the token counts of the completion.
+        """
         try:
             # Get current time
-            current_time = asyncio.run(self.get_current_time())
+            current_time = self.get_current_time()
             
             # Check if internet information is needed
             internet_info = ""
@@ -214,14 +324,15 @@ Core traits:
 
 Respond in a way that demonstrates your loyalty and capabilities."""
 
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            response = self.llm_router.complete(
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": text}
                 ],
                 temperature=0.7
             )
+            if usage is not None and response.usage is not None:
+                usage["total_tokens"] = response.usage.total_tokens
             return response.choices[0].message.content
         except Exception as e:
             logger.error(f"Error generating response: {e}")
@@ -232,7 +343,7 @@ Respond in a way that demonstrates your loyalty and capabilities."""
         if status:
             logger.warning(f"Audio callback status: {status}")
         if self.is_listening:
-            self.audio_queue.put(indata.copy())
+            self.audio_queue.put(self.audio_frontend.process(indata).copy())
 
     def start_listening(self):
         """Start continuous audio listening"""
@@ -272,22 +383,37 @@ Respond in a way that demonstrates your loyalty and capabilities."""
                 # Get audio chunk from queue
                 audio_chunk = self.audio_queue.get()
                 
-                # Add to buffer
+                # Add to buffer and extract features once for all consumers
                 self.audio_buffer.extend(audio_chunk.flatten())
-                
-                # Convert buffer to numpy array
-                audio_data = np.array(list(self.audio_buffer))
-                
-                # Check for wake word
-                if self.detect_wake_word(audio_data):
+                start, end = self.feature_cache.push(audio_chunk)
+                self.endpointer.update_noise_floor_energies(self.feature_cache.rms(start, end))
+
+                # Check for wake word over the last few seconds of frames
+                window_start = max(end - self.wake_window_frames, self.wake_search_start)
+                window_rms = self.feature_cache.rms(window_start, end)
+                if len(window_rms) == 0 or np.mean(window_rms) < self.wake_word_threshold:
+                    continue
+                wake_offset = self.locate_wake_word_in_features(self.feature_cache.log_mel(window_start, end))
+                if wake_offset is not None:
                     logger.info("Wake word detected!")
+                    # A request is coming; make sure the LLM connection is hot
+                    self.llm_client.prewarm_if_idle()
                     if self.on_wake_word_detected:
                         self.on_wake_word_detected()
-                    
+
+                    # Speech after the wake word starts the command; drop the
+                    # window so it is not transcribed again by wake detection
+                    wake_frame = window_start + wake_offset
+                    audio_data = np.array(self.audio_buffer, dtype=self.dtype)
+                    buffer_start = self.feature_cache.n_samples - len(audio_data)
+                    pre_roll = audio_data[max(0, wake_frame * HOP_LENGTH - buffer_start):]
+                    self.audio_buffer.clear()
+
                     # Process the following audio
-                    command_audio = self.capture_command()
+                    command_audio = self.capture_command(pre_roll, start_frame=wake_frame)
                     if command_audio is not None:
-                        self.process_command(command_audio)
+                        self.process_command(command_audio, log_mel=self.feature_cache.log_mel(*self.last_command_frames))
+                    self.wake_search_start = self.feature_cache.n_frames
                 
             except Exception as e:
                 logger.error(f"Error processing audio stream: {e}")
@@ -301,48 +427,95 @@ Respond in a way that demonstrates your loyalty and capabilities."""
         self.on_transcription = transcription_callback
         self.on_response = response_callback
 
-    def capture_command(self) -> Optional[np.ndarray]:
-        """Capture command after wake word"""
+    def capture_command(self, pre_roll: Optional[np.ndarray] = None,
+                        start_frame: Optional[int] = None) -> Optional[np.ndarray]:
+        """Capture command after wake word, starting with any pre-roll audio
+
+        ``start_frame`` is the feature-cache frame where the pre-roll begins;
+        the frames of the captured command end up in ``last_command_frames``.
+        """
         logger.info("Capturing command...")
         command_buffer = []
-        silence_threshold = 0.1
-        silence_duration = 0
-        max_silence = 2  # seconds
-        
+        self.endpointer.reset()
+        if start_frame is None:
+            start_frame = self.feature_cache.n_frames
+
+        if self.speculative_llm:
+            self.speculator.reset()
+
         start_time = time.time()
-        while silence_duration < max_silence and time.time() - start_time < 10:
+        if pre_roll is not None and len(pre_roll):
+            command_buffer.append(np.asarray(pre_roll, dtype=self.dtype).reshape(-1))
+        self.endpointer.process_energies(self.feature_cache.rms(start_frame))
+
+        while not self.endpointer.done and time.time() - start_time < self.max_command_duration:
             try:
                 audio_chunk = self.audio_queue.get(timeout=1)
-                command_buffer.append(audio_chunk)
-                
-                # Check for silence
-                if np.max(np.abs(audio_chunk)) < silence_threshold:
-                    silence_duration += self.chunk_duration
-                else:
-                    silence_duration = 0
-                    
             except queue.Empty:
+                self.endpointer.finish("stream_end")
                 break
-        
+            command_buffer.append(audio_chunk.flatten())
+
+            # Stop as soon as the endpointer sees enough trailing silence
+            start, end = self.feature_cache.push(audio_chunk)
+            if self.endpointer.process_energies(self.feature_cache.rms(start, end)):
+                break
+
+            # Partial transcript so a stable command can be sent to the LLM early
+            if self.speculative_llm and self.endpointer.has_speech:
+                partial = self.transcribe_features(self.feature_cache.log_mel(start_frame))
+                self.speculator.observe_partial(partial)
+        self.endpointer.finish("timeout")
+
+        self.last_endpoint_trace = self.endpointer.trace()
+        self.last_endpoint_trace["wall_time"] = round(time.time() - start_time, 3)
+        logger.info(f"Endpoint trace: {self.last_endpoint_trace}")
+        self.last_command_frames = (start_frame, start_frame + self.endpointer.endpoint_frame)
+
+        # Whisper hallucinates text on silence, so never hand it a silent buffer
+        if self.last_endpoint_trace["reason"] == "no_speech" or not self.endpointer.has_speech:
+            logger.info("No speech after wake word; skipping transcription")
+            return None
+
         if command_buffer:
-            return np.concatenate(command_buffer)
+            command_audio = np.concatenate(command_buffer)
+            endpoint = self.endpointer.endpoint_sample
+            if endpoint:
+                command_audio = command_audio[:endpoint]
+            return command_audio
         return None
 
-    def process_command(self, audio_data: np.ndarray):
+    def process_command(self, audio_data: np.ndarray, log_mel: Optional[np.ndarray] = None,
+                        profile: Optional[str] = None):
         """Process captured command with enhanced features"""
         try:
-            # Transcribe command
-            result = self.transcription_pipeline({"raw": audio_data, "sampling_rate": self.sample_rate})
-            transcription = result["text"]
+            # Transcribe command, reusing cached features when available
+            if log_mel is None:
+                log_mel = compute_log_mel(audio_data, self.feature_cache.mel_filters)
+            transcription = self.transcribe_features(log_mel, profile)
             
             if self.on_transcription:
                 self.on_transcription(transcription)
             
-            # Get emotion with enhanced accuracy
-            emotion = self.emotion_classifier(transcription)[0]
-            
-            # Generate enhanced response
-            response = self.generate_response(transcription, emotion["label"])
+            # Answer deterministic intents locally, otherwise ask the LLM
+            local = self.intent_router.route(transcription)
+            response = None
+            if local is not None:
+                response = local["response"]
+                self.speculator.reset()
+            elif self.speculative_llm:
+                # Reuse the early request if it was made for this transcript
+                response = self.speculator.resolve(transcription)
+                logger.info(f"Speculation stats: {self.speculator.get_stats()}")
+            logger.info(f"Intent stats: {self.intent_router.get_stats()}")
+
+            if response is None:
+                # Get emotion with enhanced accuracy
+                emotion = self.emotion_service.classify(transcription)
+
+                # Generate enhanced response
+                response = self.generate_response(transcription, emotion["label"])
+            self.intent_router.remember(response)
             
             if self.on_response:
                 self.on_response(response)
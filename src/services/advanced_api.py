@@ -87,6 +87,10 @@ async def websocket_endpoint(websocket: WebSocket):
         manager.disconnect(websocket)
         ai_service.stop_listening()
 
+@app.get("/intent-stats")
+async def intent_stats():
+    return ai_service.intent_router.get_stats()
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting IRIS AI Service...")
@@ -96,4 +100,4 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down IRIS AI Service...")
-    ai_service.stop_listening() 
\ No newline at end of file
+    await ai_service.cleanup() 
\ No newline at end of file
@@ -1,48 +1,72 @@
 import torch
 import numpy as np
 import sounddevice as sd
-from transformers import pipeline
 import json
 import os
-from typing import Dict, List, Optional
-import openai
+from typing import Callable, Dict, List, Optional
 from pydantic import BaseModel
+from .emotion_service import get_emotion_service
+from .llm_router import get_llm_router, close_llm_router
+from .llm_client import get_llm_client
+from .audio_frontend import prepare_audio, TARGET_SAMPLE_RATE
+from .longform import LongFormTranscriber
+from .runtime_config import create_pipeline
+from .decoding import generate_kwargs
 
 class AIService:
     def __init__(self):
         # Initialize ASR
-        self.transcription_pipeline = pipeline("automatic-speech-recognition", "openai/whisper-base")
+        self.transcription_pipeline = create_pipeline("automatic-speech-recognition", "openai/whisper-base")
+        
+        # Chunked, parallel transcription for recordings longer than one window
+        self.long_form_threshold = 30.0  # seconds
+        self.long_form_transcriber = LongFormTranscriber(pipeline=self.transcription_pipeline)
         
         # Initialize TTS
-        self.tts_pipeline = pipeline("text-to-speech", "facebook/fastspeech2-en-ljspeech")
+        self.tts_pipeline = create_pipeline("text-to-speech", "facebook/fastspeech2-en-ljspeech")
         
-        # Initialize Emotion Recognition
-        self.emotion_classifier = pipeline(
-            "text-classification",
-            model="j-hartmann/emotion-english-distilroberta-base"
-        )
+        # Initialize Emotion Recognition (shared, batched and cached)
+        self.emotion_service = get_emotion_service()
         
         # OpenAI Configuration
-        self.openai_client = openai.OpenAI()
+        self.llm_client = get_llm_client()
+        self.openai_client = self.llm_client.client
+        self.llm_router = get_llm_router()
+
+    def shutdown(self):
+        """Stop the long-form worker pool and the shared LLM router's threads"""
+        self.long_form_transcriber.shutdown()
+        close_llm_router()
 
-    def process_audio(self, audio_data: np.ndarray, sample_rate: int) -> Dict:
+    def process_audio(self, audio_data: np.ndarray, sample_rate: int,
+                      on_progress: Optional[Callable[[Dict], None]] = None,
+                      profile: str = "dictation") -> Dict:
         try:
-            # Convert audio to format expected by Whisper
-            if len(audio_data.shape) > 1:
-                audio_data = audio_data.mean(axis=1)
+            # Convert audio to format expected by Whisper (mono 16 kHz float32)
+            audio_data = prepare_audio(audio_data, sample_rate)
+            sample_rate = TARGET_SAMPLE_RATE
             
             results = {
                 "transcription": None,
                 "emotion": None
             }
             
-            # ASR using Whisper
-            transcription = self.transcription_pipeline({"raw": audio_data, "sampling_rate": sample_rate})
-            results["transcription"] = transcription["text"]
+            # ASR using Whisper; long recordings are split at silences and
+            # transcribed in parallel
+            if len(audio_data) > self.long_form_threshold * sample_rate:
+                long_form = self.long_form_transcriber.transcribe(audio_data, on_progress=on_progress, profile=profile)
+                results["transcription"] = long_form["text"]
+                results["segments"] = long_form["segments"]
+            else:
+                transcription = self.transcription_pipeline(
+                    {"raw": audio_data, "sampling_rate": sample_rate},
+                    generate_kwargs=generate_kwargs(profile)
+                )
+                results["transcription"] = transcription["text"]
             
             # Emotion Recognition
             if results["transcription"]:
-                emotion = self.emotion_classifier(results["transcription"])[0]
+                emotion = self.emotion_service.classify(results["transcription"])
                 results["emotion"] = emotion["label"]
             
             return results
@@ -52,8 +76,7 @@ class AIService:
 
     def generate_response(self, text: str, system_prompt: str = "") -> str:
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",  # or "gpt-3.5-turbo"
+            response = self.llm_router.complete(
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": text}
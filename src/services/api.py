@@ -1,11 +1,17 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import numpy as np
 from typing import Optional, Dict
 import soundfile as sf
 import io
+import json
+import asyncio
 from .ai_service import AIService
+from .audio_frontend import prepare_audio, TARGET_SAMPLE_RATE
+from .coalescing import SingleFlight, request_key
+from .decoding import DECODING_PROFILES
 
 app = FastAPI()
 
@@ -21,27 +27,77 @@ app.add_middleware(
 # Initialize AI Service
 ai_service = AIService()
 
+# Identical concurrent requests (e.g. kiosk broadcasts) share one computation
+response_flight = SingleFlight("generate-response")
+tts_flight = SingleFlight("text-to-speech")
+
+async def run_in_thread(fn, *args):
+    """Run blocking model work off the event loop so requests can overlap"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, fn, *args)
+
 class TextRequest(BaseModel):
     text: str
     system_prompt: Optional[str] = ""
 
+def check_profile(profile: str):
+    if profile not in DECODING_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown decoding profile '{profile}'")
+
 @app.post("/process-audio")
-async def process_audio(file: UploadFile = File(...)):
+async def process_audio(file: UploadFile = File(...), profile: str = "dictation"):
+    check_profile(profile)
     try:
         # Read audio file
         contents = await file.read()
-        audio_data, sample_rate = sf.read(io.BytesIO(contents))
+        audio_data, sample_rate = sf.read(io.BytesIO(contents), dtype="float32")
+        audio_data = prepare_audio(audio_data, sample_rate)
         
         # Process audio
-        results = ai_service.process_audio(audio_data, sample_rate)
+        results = ai_service.process_audio(audio_data, TARGET_SAMPLE_RATE, profile=profile)
         return results
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/process-audio/stream")
+async def process_audio_stream(file: UploadFile = File(...), profile: str = "dictation"):
+    """Same as /process-audio, streaming NDJSON progress events per chunk"""
+    check_profile(profile)
+    try:
+        contents = await file.read()
+        audio_data, sample_rate = sf.read(io.BytesIO(contents), dtype="float32")
+        audio_data = prepare_audio(audio_data, sample_rate)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_progress(event):
+        loop.call_soon_threadsafe(events.put_nowait, {"type": "progress", **event})
+
+    async def run():
+        results = await run_in_thread(ai_service.process_audio, audio_data, TARGET_SAMPLE_RATE, on_progress, profile)
+        await events.put({"type": "result", **results})
+
+    async def stream():
+        task = asyncio.ensure_future(run())
+        while True:
+            event = await events.get()
+            yield json.dumps(event) + "\n"
+            if event["type"] == "result":
+                break
+        await task
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/generate-response")
 async def generate_response(request: TextRequest):
     try:
-        response = ai_service.generate_response(request.text, request.system_prompt)
+        response = await response_flight.do(
+            request_key(request.text, request.system_prompt, collapse_whitespace=True),
+            lambda: run_in_thread(ai_service.generate_response, request.text, request.system_prompt)
+        )
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -49,8 +105,11 @@ async def generate_response(request: TextRequest):
 @app.post("/text-to-speech")
 async def text_to_speech(request: TextRequest):
     try:
-        audio_data = ai_service.text_to_speech(request.text)
-        return {"audio": audio_data.tolist()}
+        audio = await tts_flight.do(
+            request_key(request.text),
+            lambda: run_in_thread(lambda: ai_service.text_to_speech(request.text).tolist())
+        )
+        return {"audio": audio}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -58,8 +117,30 @@ async def text_to_speech(request: TextRequest):
 async def detect_wake_word(file: UploadFile = File(...)):
     try:
         contents = await file.read()
-        audio_data, sample_rate = sf.read(io.BytesIO(contents))
+        audio_data, sample_rate = sf.read(io.BytesIO(contents), dtype="float32")
+        audio_data = prepare_audio(audio_data, sample_rate)
         is_wake_word = ai_service.detect_wake_word(audio_data)
         return {"detected": is_wake_word}
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/emotion-stats")
+async def emotion_stats():
+    return ai_service.emotion_service.get_stats()
+
+@app.get("/llm-stats")
+async def llm_stats():
+    stats = ai_service.llm_router.get_stats()
+    stats["client"] = ai_service.llm_client.get_stats()
+    return stats
+
+@app.get("/coalescing-stats")
+async def coalescing_stats():
+    return {
+        "generate-response": response_flight.get_stats(),
+        "text-to-speech": tts_flight.get_stats(),
+    }
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    ai_service.shutdown()
@@ -0,0 +1,126 @@
+import logging
+from functools import lru_cache
+from math import gcd
+from typing import Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+TARGET_SAMPLE_RATE = 16000
+
+# Outputs computed per vectorised block; bounds the gather matrix size
+_BLOCK_SIZE = 8192
+
+
+@lru_cache(maxsize=32)
+def _polyphase_filter(up: int, down: int, half_width: int = 10,
+                      beta: float = 5.0) -> Tuple[np.ndarray, int, int]:
+    """Design the anti-aliasing FIR for a rate pair and split it into phases
+
+    Returns ``(bank, taps, delay)`` where ``bank[p]`` holds the taps of phase
+    ``p`` in reversed order (ready to dot with an ascending input window),
+    ``taps`` is the length of each phase and ``delay`` the group delay in
+    upsampled samples.
+    """
+    max_rate = max(up, down)
+    length = 2 * half_width * max_rate + 1
+    cutoff = 0.5 / max_rate
+    t = np.arange(length) - (length - 1) / 2.0
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(length, beta) * up
+
+    taps = -(-length // up)
+    padded = np.zeros(taps * up)
+    padded[:length] = kernel
+    bank = padded.reshape(taps, up).T[:, ::-1]
+    return np.ascontiguousarray(bank, dtype=np.float32), taps, (length - 1) // 2
+
+
+def to_mono(audio: np.ndarray) -> np.ndarray:
+    """Mix ``(frames, channels)`` audio down to a 1-D float32 signal"""
+    audio = np.asarray(audio)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1) if audio.shape[1] > 1 else audio[:, 0]
+    return audio.astype(np.float32, copy=False)
+
+
+class AudioFrontend:
+    def __init__(self, input_rate: int, target_rate: int = TARGET_SAMPLE_RATE):
+        """Stateful mono/float32/resampling stage for chunked audio streams"""
+        self.input_rate = int(input_rate)
+        self.target_rate = int(target_rate)
+        divisor = gcd(self.input_rate, self.target_rate)
+        self.up = self.target_rate // divisor
+        self.down = self.input_rate // divisor
+        self.passthrough = self.up == self.down
+        if not self.passthrough:
+            self._bank, self._taps, self._delay = _polyphase_filter(self.up, self.down)
+        self.reset()
+
+    def reset(self):
+        """Forget stream history"""
+        self._n_in = 0
+        self._n_out = 0
+        if not self.passthrough:
+            # Left zero padding so the first outputs see a full filter window
+            self._x = np.zeros(self._taps - 1, dtype=np.float32)
+            self._x_start = -(self._taps - 1)
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """Convert one chunk; returns all output samples that are now final"""
+        audio = to_mono(chunk)
+        if self.passthrough:
+            return audio
+        self._x = np.concatenate([self._x, audio])
+        self._n_in += len(audio)
+        # Largest output whose newest input sample has already arrived
+        n_end = (self._n_in * self.up - 1 - self._delay) // self.down + 1
+        return self._emit(max(n_end, self._n_out))
+
+    def flush(self) -> np.ndarray:
+        """Emit the remaining tail of the stream, zero padding the input"""
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        n_end = -(-self._n_in * self.up // self.down)
+        self._x = np.concatenate([self._x, np.zeros(self._taps, dtype=np.float32)])
+        out = self._emit(max(n_end, self._n_out))
+        self.reset()
+        return out
+
+    def _emit(self, n_end: int) -> np.ndarray:
+        n_start = self._n_out
+        if n_end <= n_start:
+            return np.zeros(0, dtype=np.float32)
+
+        windows = sliding_window_view(self._x, self._taps)
+        out = np.empty(n_end - n_start, dtype=np.float32)
+        for block_start in range(n_start, n_end, _BLOCK_SIZE):
+            n = np.arange(block_start, min(block_start + _BLOCK_SIZE, n_end))
+            position = n * self.down + self._delay
+            newest = position // self.up - self._x_start
+            out[block_start - n_start:block_start - n_start + len(n)] = np.einsum(
+                "ij,ij->i", windows[newest - self._taps + 1], self._bank[position % self.up])
+        self._n_out = n_end
+
+        # Drop input that no future output can reach
+        oldest = (n_end * self.down + self._delay) // self.up - self._taps + 1
+        drop = max(0, oldest - self._x_start)
+        if drop:
+            self._x = self._x[drop:]
+            self._x_start += drop
+        return out
+
+
+def resample(audio: np.ndarray, orig_rate: int, target_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Resample a whole signal in one call using the streaming filter"""
+    frontend = AudioFrontend(orig_rate, target_rate)
+    out = frontend.process(audio)
+    if frontend.passthrough:
+        return out
+    return np.concatenate([out, frontend.flush()])
+
+
+def prepare_audio(audio: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Convert any decoded audio to mono float32 at TARGET_SAMPLE_RATE"""
+    return resample(audio, sample_rate, TARGET_SAMPLE_RATE)
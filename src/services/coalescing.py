@@ -0,0 +1,61 @@
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(*parts: Any, collapse_whitespace: bool = False, casefold: bool = False) -> str:
+    """Hash of the request fields, case sensitive unless ``casefold`` is set
+
+    ``collapse_whitespace`` treats runs of whitespace as one space, for
+    inputs where spacing cannot change the result.
+    """
+    normalized = []
+    for part in parts:
+        text = str(part or "")
+        if collapse_whitespace:
+            text = " ".join(text.split())
+        if casefold:
+            text = text.casefold()
+        normalized.append(text)
+    return hashlib.sha256("\x1f".join(normalized).encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        """Coalesce identical concurrent async calls into one computation
+
+        The first caller for a key starts the work as a task; callers arriving
+        while it runs await the same task. Each caller awaits through
+        ``asyncio.shield`` so one client disconnecting does not cancel the
+        work the others are waiting on.
+        """
+        self.name = name
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self._stats["executions"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self._stats["errors"] += 1
+
+    def get_stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._inflight)
+        stats["coalescing_ratio"] = stats["coalesced"] / stats["calls"] if stats["calls"] else 0.0
+        return stats
@@ -0,0 +1,130 @@
+import re
+import json
+import time
+import argparse
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Whisper generate() settings per use case. Commands are short English
+# utterances, so skipping language detection and timestamps and bounding the
+# output keeps decoding to a handful of greedy steps.
+DECODING_PROFILES: Dict[str, Dict] = {
+    "wake": {
+        "language": "en",
+        "task": "transcribe",
+        "num_beams": 1,
+        "do_sample": False,
+        "return_timestamps": False,
+        "max_new_tokens": 16,
+    },
+    "command": {
+        "language": "en",
+        "task": "transcribe",
+        "num_beams": 1,
+        "do_sample": False,
+        "return_timestamps": False,
+        "max_new_tokens": 64,
+    },
+    "dictation": {
+        "task": "transcribe",
+        "num_beams": 5,
+        "do_sample": False,
+        "max_new_tokens": 440,
+    },
+}
+
+DEFAULT_PROFILE = "command"
+
+
+def generate_kwargs(profile: Optional[str] = None) -> Dict:
+    """Copy of the Whisper ``generate`` kwargs for a named decoding profile"""
+    name = profile or DEFAULT_PROFILE
+    if name not in DECODING_PROFILES:
+        raise ValueError(f"Unknown decoding profile '{name}'; expected one of {sorted(DECODING_PROFILES)}")
+    return dict(DECODING_PROFILES[name])
+
+
+def transcribe(pipeline, audio: np.ndarray, sample_rate: int = 16000, profile: Optional[str] = None) -> str:
+    """Run an ASR pipeline on one clip with the given decoding profile"""
+    result = pipeline({"raw": audio, "sampling_rate": sample_rate}, generate_kwargs=generate_kwargs(profile))
+    return result["text"]
+
+
+# Benchmarking
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level Levenshtein distance divided by the reference length"""
+    ref = _WORD_RE.findall(reference.lower())
+    hyp = _WORD_RE.findall(hypothesis.lower())
+    if not ref:
+        return float(len(hyp) > 0)
+    row = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        previous, row[0] = row[0], i
+        for j, hyp_word in enumerate(hyp, 1):
+            current = min(row[j] + 1, row[j - 1] + 1, previous + (ref_word != hyp_word))
+            previous, row[j] = row[j], current
+    return row[-1] / len(ref)
+
+
+def benchmark(pipeline, samples: Iterable[Dict], profiles: Optional[List[str]] = None,
+              sample_rate: int = 16000) -> Dict[str, Dict]:
+    """Latency and WER per profile over ``{"audio", "text"}`` samples"""
+    samples = list(samples)
+    report = {}
+    for name in profiles or list(DECODING_PROFILES):
+        # Warm-up so the first profile does not pay for lazy initialisation
+        transcribe(pipeline, samples[0]["audio"], sample_rate, name)
+        latencies, errors = [], []
+        for sample in samples:
+            start = time.perf_counter()
+            text = transcribe(pipeline, sample["audio"], sample_rate, name)
+            latencies.append(time.perf_counter() - start)
+            errors.append(word_error_rate(sample["text"], text))
+        report[name] = {
+            "samples": len(samples),
+            "mean_latency_ms": 1000 * float(np.mean(latencies)),
+            "p90_latency_ms": 1000 * float(np.percentile(latencies, 90)),
+            "wer": float(np.mean(errors)),
+        }
+    return report
+
+
+def _load_manifest(path: str) -> List[Dict]:
+    import soundfile as sf
+    from .audio_frontend import prepare_audio
+    samples = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            audio, sample_rate = sf.read(entry["audio"], dtype="float32")
+            samples.append({"audio": prepare_audio(audio, sample_rate), "text": entry["text"]})
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Whisper decoding profiles")
+    parser.add_argument("manifest", help='JSON lines of {"audio": path, "text": reference}')
+    parser.add_argument("--model", default="openai/whisper-base")
+    parser.add_argument("--profiles", nargs="+", choices=sorted(DECODING_PROFILES))
+    args = parser.parse_args()
+
+    from .runtime_config import create_pipeline
+    logging.basicConfig(level=logging.INFO)
+    pipeline = create_pipeline("automatic-speech-recognition", model=args.model)
+    report = benchmark(pipeline, _load_manifest(args.manifest), args.profiles)
+    for name, row in report.items():
+        print(f"{name:10s} latency {row['mean_latency_ms']:8.1f} ms (p90 {row['p90_latency_ms']:8.1f} ms)"
+              f"  WER {row['wer']:.3f}  n={row['samples']}")
+
+
+if __name__ == "__main__":
+    main()
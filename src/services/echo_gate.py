@@ -0,0 +1,151 @@
+import time
+import threading
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+
+from .audio_frontend import TARGET_SAMPLE_RATE, resample
+
+logger = logging.getLogger(__name__)
+
+
+class BlockNLMS:
+    def __init__(self, taps: int = 512, block: int = 128, step: float = 0.25, eps: float = 1e-6):
+        """Block-wise normalised LMS echo canceller
+
+        Each block of ``block`` samples is filtered with one matrix product and
+        the weights are updated once per block, so the whole thing stays in
+        vectorised NumPy.
+        """
+        self.taps = taps
+        self.block = block
+        self.step = step
+        self.eps = eps
+        self.reset()
+
+    def reset(self):
+        self.weights = np.zeros(self.taps, dtype=np.float32)
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+
+    def process(self, mic: np.ndarray, reference: np.ndarray) -> np.ndarray:
+        """Return ``mic`` with the estimated echo of ``reference`` removed"""
+        mic = np.asarray(mic, dtype=np.float32).reshape(-1)
+        reference = np.asarray(reference, dtype=np.float32).reshape(-1)[:len(mic)]
+        if len(reference) < len(mic):
+            reference = np.pad(reference, (0, len(mic) - len(reference)))
+
+        padded = np.concatenate([self._history, reference])
+        # Row i holds the reference window ending at sample i, newest first
+        windows = np.lib.stride_tricks.sliding_window_view(padded, self.taps)[:, ::-1]
+        error = np.empty_like(mic)
+        for start in range(0, len(mic), self.block):
+            block = windows[start:start + self.block]
+            residual = mic[start:start + self.block] - block @ self.weights
+            error[start:start + len(residual)] = residual
+            # Normalise by the mean window energy, as per-sample NLMS would
+            power = float(np.sum(block * block)) / len(block) + self.eps
+            self.weights += self.step * (block.T @ residual) / power
+        self._history = padded[len(padded) - (self.taps - 1):]
+        return error
+
+
+class PlaybackGate:
+    def __init__(self,
+                 sample_rate: int = TARGET_SAMPLE_RATE,
+                 tail: float = 0.4,
+                 echo_ratio: float = 0.1,
+                 barge_in_threshold: Optional[float] = None,
+                 cancel_echo: bool = True):
+        """Playback-aware capture gate that keeps IRIS from hearing itself
+
+        While TTS is playing (plus ``tail`` seconds of room reverb) microphone
+        chunks are treated as echo and skipped. If the TTS audio is passed to
+        ``playback_started`` it is subtracted with an adaptive filter, and only
+        chunks whose residual energy stays below ``echo_ratio`` of the input
+        energy are skipped, so the user can still talk over IRIS. Without a
+        reference, chunks louder than ``barge_in_threshold`` RMS still pass.
+        """
+        self.sample_rate = sample_rate
+        self.tail = tail
+        self.echo_ratio = echo_ratio
+        self.barge_in_threshold = barge_in_threshold
+        self.canceller = BlockNLMS() if cancel_echo else None
+
+        self._lock = threading.Lock()
+        self._playing = False
+        self._stopped_at = 0.0
+        self._reference: Optional[np.ndarray] = None
+        self._reference_pos = 0
+        self._seconds_per_audio_second: Optional[float] = None
+        self._stats = {"chunks": 0, "skipped_chunks": 0, "skipped_audio_s": 0.0, "saved_inference_s": 0.0}
+
+    def playback_started(self, reference: Optional[np.ndarray] = None,
+                         reference_rate: int = TARGET_SAMPLE_RATE):
+        """Mark TTS as playing, optionally with the audio being played"""
+        if reference is not None and reference_rate != self.sample_rate:
+            reference = resample(reference, reference_rate, self.sample_rate)
+        with self._lock:
+            self._playing = True
+            self._reference = reference
+            self._reference_pos = 0
+
+    def playback_stopped(self):
+        with self._lock:
+            self._playing = False
+            self._stopped_at = time.monotonic()
+
+    @property
+    def active(self) -> bool:
+        """True while playing and during the reverb tail afterwards"""
+        with self._lock:
+            return self._playing or time.monotonic() - self._stopped_at < self.tail
+
+    def should_skip(self, chunk: np.ndarray) -> bool:
+        """Decide whether a microphone chunk is echo-only and not worth ASR"""
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        with self._lock:
+            self._stats["chunks"] += 1
+            reference = None
+            if self._reference is not None:
+                reference = self._reference[self._reference_pos:self._reference_pos + len(chunk)]
+                self._reference_pos += len(chunk)
+        if not self.active:
+            return False
+
+        energy = float(np.sqrt(np.mean(chunk * chunk))) if len(chunk) else 0.0
+        if reference is not None and self.canceller is not None and len(reference):
+            residual = self.canceller.process(chunk, reference)
+            residual_energy = float(np.sqrt(np.mean(residual * residual)))
+            echo_only = residual_energy <= self.echo_ratio * energy
+        elif self.barge_in_threshold is not None:
+            echo_only = energy < self.barge_in_threshold
+        else:
+            echo_only = True
+
+        if echo_only:
+            self._record_skip(len(chunk) / self.sample_rate)
+        return echo_only
+
+    def record_inference(self, audio_seconds: float, elapsed: float):
+        """Report ASR cost so skipped audio can be converted to saved time"""
+        if audio_seconds <= 0:
+            return
+        rate = elapsed / audio_seconds
+        with self._lock:
+            previous = self._seconds_per_audio_second
+            self._seconds_per_audio_second = rate if previous is None else 0.9 * previous + 0.1 * rate
+
+    def _record_skip(self, audio_seconds: float):
+        with self._lock:
+            self._stats["skipped_chunks"] += 1
+            self._stats["skipped_audio_s"] += audio_seconds
+            if self._seconds_per_audio_second is not None:
+                self._stats["saved_inference_s"] += audio_seconds * self._seconds_per_audio_second
+
+    def get_stats(self) -> Dict:
+        """Skipped chunk counters and estimated ASR time saved"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["skip_ratio"] = stats["skipped_chunks"] / stats["chunks"] if stats["chunks"] else 0.0
+        return stats
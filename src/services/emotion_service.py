@@ -0,0 +1,227 @@
+import re
+import threading
+import queue
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+
+# Small keyword lexicon over the DistilRoBERTa label set. Only used when the
+# evidence is unambiguous; anything else falls through to the model. Words
+# that commonly appear in neutral commands ("turn down", "great", "thanks",
+# "I'd love a coffee", "mad" as an intensifier) are deliberately left out.
+EMOTION_LEXICON = {
+    "joy": {"happy", "glad", "awesome", "wonderful", "excited", "yay",
+            "amazing", "fantastic", "delighted", "thrilled"},
+    "sadness": {"sad", "unhappy", "depressed", "lonely", "miserable", "crying",
+                "heartbroken", "grief"},
+    "anger": {"angry", "furious", "annoyed", "hate", "irritated",
+              "pissed", "outraged", "livid"},
+    "fear": {"scared", "afraid", "terrified", "worried", "anxious", "nervous",
+             "frightened", "panic"},
+    "surprise": {"wow", "surprised", "unexpected", "shocked", "whoa",
+                 "astonished", "unbelievable"},
+    "disgust": {"disgusting", "gross", "revolting", "nasty", "yuck", "eww",
+                "sickening"},
+}
+
+# Words that flip or hedge the meaning of a lexicon hit ("not happy")
+NEGATIONS = {"not", "no", "never", "don't", "isn't", "wasn't", "aren't",
+             "can't", "won't", "didn't", "hardly", "barely"}
+
+_WORD_RE = re.compile(r"[a-z']+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalise text so trivially different transcriptions share a cache key"""
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+class EmotionService:
+    def __init__(self,
+                 classifier=None,
+                 device: Optional[str] = None,
+                 max_batch_size: int = 16,
+                 max_wait_ms: float = 10.0,
+                 cache_size: int = 1024,
+                 lexicon_min_hits: int = 2,
+                 lexicon_min_confidence: float = 0.6):
+        """Micro-batching, caching emotion classifier with a lexicon fast path"""
+        if classifier is None:
+            from .runtime_config import create_pipeline
+            classifier = create_pipeline(
+                "text-classification",
+                model=EMOTION_MODEL,
+                device=device
+            )
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache_size = cache_size
+        self.lexicon_min_hits = lexicon_min_hits
+        self.lexicon_min_confidence = lexicon_min_confidence
+
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._requests: "queue.Queue[Tuple[str, str, Future]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "cache": 0,
+            "lexicon": 0,
+            "model": 0,
+            "batches": 0,
+        }
+
+        self._worker = threading.Thread(target=self._batch_loop)
+        self._worker.daemon = True
+        self._worker.start()
+
+    def classify(self, text: str) -> Dict:
+        """Return the top emotion as ``{"label": ..., "score": ...}``"""
+        return self.classify_async(text).result()
+
+    def classify_async(self, text: str) -> Future:
+        """Submit text for classification and return a Future for the result"""
+        # The normalised form is only a cache key; the model sees the original
+        # text, casing and punctuation included.
+        key = normalize_text(text)
+        self._count("requests")
+
+        cached = self._cache_get(key)
+        if cached is not None:
+            self._count("cache")
+            return self._resolved(cached)
+
+        quick = self._lexicon_classify(key)
+        if quick is not None:
+            self._count("lexicon")
+            self._cache_put(key, quick)
+            return self._resolved(quick)
+
+        future: Future = Future()
+        self._requests.put((key, text, future))
+        return future
+
+    def get_stats(self) -> Dict:
+        """Return request counters and the share handled by each path"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total = stats["requests"] or 1
+        for path in ("cache", "lexicon", "model"):
+            stats[f"{path}_ratio"] = stats[path] / total
+        stats["avg_batch_size"] = stats["model"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def _lexicon_classify(self, key: str) -> Optional[Dict]:
+        """Cheap keyword model; returns None unless the answer is obvious
+
+        Needs ``lexicon_min_hits`` keywords for the winning label. The reported
+        confidence grows with the number of hits and shrinks with hits for
+        other labels, and must reach ``lexicon_min_confidence``.
+        """
+        hits = {}
+        words = key.split()
+        if NEGATIONS.intersection(words):
+            return None
+        for word in words:
+            for label, lexicon in EMOTION_LEXICON.items():
+                if word in lexicon:
+                    hits[label] = hits.get(label, 0) + 1
+        if not hits:
+            return None
+        label, best = max(hits.items(), key=lambda item: item[1])
+        if best < self.lexicon_min_hits:
+            return None
+        share = best / sum(hits.values())
+        confidence = share * best / (best + 1)
+        if confidence < self.lexicon_min_confidence:
+            return None
+        return {"label": label, "score": confidence}
+
+    def _batch_loop(self):
+        """Collect pending requests into micro-batches and run the model"""
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[Tuple[str, str, Future]]):
+        """Classify unique texts in one pipeline call and resolve all futures"""
+        pending: Dict[str, List[Future]] = {}
+        originals: Dict[str, str] = {}
+        for key, text, future in batch:
+            pending.setdefault(key, []).append(future)
+            originals.setdefault(key, text)
+        keys = list(pending)
+        texts = [originals[key] for key in keys]
+        try:
+            outputs = self.classifier(texts, batch_size=len(texts))
+        except Exception as e:
+            logger.error(f"Emotion classification error: {e}")
+            for futures in pending.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        self._count("batches")
+        self._count("model", len(batch))
+        for key, output in zip(keys, outputs):
+            result = output[0] if isinstance(output, list) else output
+            self._cache_put(key, result)
+            for future in pending[key]:
+                future.set_result(result)
+
+    def _cache_get(self, key: str) -> Optional[Dict]:
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+            return result
+
+    def _cache_put(self, key: str, result: Dict):
+        with self._cache_lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    @staticmethod
+    def _resolved(result: Dict) -> Future:
+        future: Future = Future()
+        future.set_result(result)
+        return future
+
+
+_shared_service: Optional[EmotionService] = None
+_shared_lock = threading.Lock()
+
+
+def get_emotion_service(device: Optional[str] = None) -> EmotionService:
+    """Return the process-wide emotion service, creating it on first use"""
+    global _shared_service
+    with _shared_lock:
+        if _shared_service is None:
+            from .runtime_config import load_profile
+            _shared_service = EmotionService(
+                device=device,
+                max_batch_size=int(load_profile()["emotion_batch_size"])
+            )
+        return _shared_service
@@ -0,0 +1,185 @@
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class Endpointer:
+    def __init__(self,
+                 sample_rate: int = 16000,
+                 frame_ms: float = 20.0,
+                 snr_ratio: float = 3.0,
+                 min_threshold: float = 0.005,
+                 noise_adapt: float = 0.05,
+                 min_trailing_silence: float = 0.3,
+                 max_trailing_silence: float = 1.0,
+                 trailing_ratio: float = 0.1,
+                 max_leading_silence: float = 3.0,
+                 max_duration: float = 10.0,
+                 tail_padding: float = 0.15):
+        """Energy endpointer with a tracked noise floor and adaptive hangover
+
+        Audio is analysed in ``frame_ms`` frames. A frame counts as speech when
+        its RMS exceeds ``snr_ratio`` times the running noise floor. The
+        command ends once the trailing silence exceeds a window that grows
+        with the length of the utterance, from ``min_trailing_silence`` for
+        one-word commands up to ``max_trailing_silence``.
+        """
+        self.sample_rate = sample_rate
+        self.frame_samples = max(1, int(sample_rate * frame_ms / 1000.0))
+        self.frame_duration = self.frame_samples / sample_rate
+        self.snr_ratio = snr_ratio
+        self.min_threshold = min_threshold
+        self.noise_adapt = noise_adapt
+        self.min_trailing_silence = min_trailing_silence
+        self.max_trailing_silence = max_trailing_silence
+        self.trailing_ratio = trailing_ratio
+        self.max_leading_silence = max_leading_silence
+        self.max_duration = max_duration
+        self.tail_padding = tail_padding
+
+        self.noise_floor: Optional[float] = None
+        self.reset()
+
+    def reset(self):
+        """Start a new utterance; the noise floor estimate is kept"""
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._frames = 0
+        self._speech_start: Optional[int] = None
+        self._last_speech: Optional[int] = None
+        self._endpoint: Optional[int] = None
+        self._reason: Optional[str] = None
+
+    @property
+    def threshold(self) -> float:
+        floor = self.noise_floor if self.noise_floor is not None else 0.0
+        return max(self.min_threshold, floor * self.snr_ratio)
+
+    @property
+    def done(self) -> bool:
+        return self._endpoint is not None
+
+    @property
+    def endpoint_sample(self) -> Optional[int]:
+        """Sample offset (from reset) where the command audio should be cut"""
+        if self._endpoint is None:
+            return None
+        return self._endpoint * self.frame_samples
+
+    @property
+    def has_speech(self) -> bool:
+        """Whether speech has started in the current utterance"""
+        return self._speech_start is not None
+
+    @property
+    def endpoint_frame(self) -> Optional[int]:
+        """Frame count (from reset) where the command ends"""
+        return self._endpoint
+
+    def _frame_energies(self, audio: np.ndarray) -> np.ndarray:
+        """Split audio into whole frames and return their RMS values"""
+        audio = np.concatenate([self._remainder, np.asarray(audio, dtype=np.float32).reshape(-1)])
+        n_frames = len(audio) // self.frame_samples
+        used = n_frames * self.frame_samples
+        self._remainder = audio[used:]
+        frames = audio[:used].reshape(n_frames, self.frame_samples)
+        return np.sqrt(np.mean(frames * frames, axis=1))
+
+    def _adapt_noise(self, energies: np.ndarray):
+        if len(energies) == 0:
+            return
+        if self.noise_floor is None:
+            self.noise_floor = float(np.percentile(energies, 20))
+            return
+        for energy in energies:
+            self.noise_floor += self.noise_adapt * (float(energy) - self.noise_floor)
+
+    def update_noise_floor(self, audio: np.ndarray):
+        """Feed background audio (e.g. while waiting for the wake word)"""
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        n_frames = len(audio) // self.frame_samples
+        if n_frames == 0:
+            return
+        frames = audio[:n_frames * self.frame_samples].reshape(n_frames, self.frame_samples)
+        self.update_noise_floor_energies(np.sqrt(np.mean(frames * frames, axis=1)))
+
+    def update_noise_floor_energies(self, energies: np.ndarray):
+        """Same as update_noise_floor, for precomputed per-frame RMS values"""
+        energies = np.asarray(energies)
+        # Ignore frames that look like speech so talking does not raise the floor
+        self._adapt_noise(energies[energies < self.threshold])
+
+    def required_silence(self) -> float:
+        """Trailing silence needed to end the current utterance"""
+        if self._speech_start is None or self._last_speech is None:
+            return self.min_trailing_silence
+        speech_length = (self._last_speech - self._speech_start + 1) * self.frame_duration
+        return min(self.max_trailing_silence,
+                   self.min_trailing_silence + self.trailing_ratio * speech_length)
+
+    def process(self, audio: np.ndarray) -> bool:
+        """Consume a chunk of audio; returns True once the endpoint is found"""
+        if self.done:
+            return True
+        return self.process_energies(self._frame_energies(audio))
+
+    def process_energies(self, energies: np.ndarray) -> bool:
+        """Consume precomputed per-frame RMS values (one per ``frame_ms``)"""
+        if self.done:
+            return True
+        for energy in energies:
+            index = self._frames
+            self._frames += 1
+            if energy >= self.threshold:
+                if self._speech_start is None:
+                    self._speech_start = index
+                self._last_speech = index
+            else:
+                self._adapt_noise(np.array([energy]))
+
+            elapsed = self._frames * self.frame_duration
+            if self._speech_start is None:
+                if elapsed >= self.max_leading_silence:
+                    self._finish(self._frames, "no_speech")
+                    break
+            else:
+                silence = (index - self._last_speech) * self.frame_duration
+                if silence >= self.required_silence():
+                    padding = int(self.tail_padding / self.frame_duration)
+                    self._finish(min(self._frames, self._last_speech + 1 + padding), "silence")
+                    break
+            if elapsed >= self.max_duration:
+                self._finish(self._frames, "max_duration")
+                break
+        return self.done
+
+    def finish(self, reason: str = "stream_end"):
+        """Force an endpoint, e.g. when the audio stream runs dry"""
+        if not self.done:
+            self._finish(self._frames, reason)
+
+    def _finish(self, frame: int, reason: str):
+        self._endpoint = frame
+        self._reason = reason
+
+    def trace(self) -> Dict:
+        """Timing details of the last endpoint decision, in seconds"""
+        def seconds(frame):
+            return None if frame is None else round(frame * self.frame_duration, 3)
+
+        last_speech_end = None if self._last_speech is None else self._last_speech + 1
+        trace = {
+            "reason": self._reason,
+            "speech_start": seconds(self._speech_start),
+            "speech_end": seconds(last_speech_end),
+            "endpoint": seconds(self._endpoint),
+            "decided_at": seconds(self._frames),
+            "required_silence": round(self.required_silence(), 3),
+            "noise_floor": self.noise_floor,
+            "threshold": self.threshold,
+        }
+        if last_speech_end is not None:
+            trace["post_speech_wait"] = round((self._frames - last_speech_end) * self.frame_duration, 3)
+        return trace
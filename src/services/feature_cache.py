@@ -0,0 +1,144 @@
+import threading
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+# Whisper front-end constants (16 kHz input, 25 ms window, 10 ms hop)
+N_FFT = 400
+HOP_LENGTH = 160
+N_MELS = 80
+WHISPER_FRAMES = 3000  # 30 s of features, the fixed encoder input length
+LOG_FLOOR = -10.0      # log10 of the mel floor, i.e. what silence pads to
+
+
+def whisper_mel_filters(n_mels: int = N_MELS, sample_rate: int = 16000) -> np.ndarray:
+    """Slaney mel filter bank of shape (n_fft // 2 + 1, n_mels) as used by Whisper"""
+    from transformers.audio_utils import mel_filter_bank
+    return mel_filter_bank(
+        num_frequency_bins=1 + N_FFT // 2,
+        num_mel_filters=n_mels,
+        min_frequency=0.0,
+        max_frequency=sample_rate / 2,
+        sampling_rate=sample_rate,
+        norm="slaney",
+        mel_scale="slaney",
+    ).astype(np.float32)
+
+
+def normalize_log_mel(log_mel: np.ndarray, n_frames: int = WHISPER_FRAMES) -> np.ndarray:
+    """Pad raw log10-mel frames to the encoder length and apply Whisper scaling
+
+    ``log_mel`` has shape (frames, n_mels); the result is (n_mels, n_frames)
+    float32, ready to be batched into ``input_features``.
+    """
+    log_mel = log_mel[:n_frames]
+    padded = np.full((n_frames, log_mel.shape[1]), LOG_FLOOR, dtype=np.float32)
+    padded[:len(log_mel)] = log_mel
+    padded = np.maximum(padded, padded.max() - 8.0)
+    return ((padded + 4.0) / 4.0).T
+
+
+class FeatureCache:
+    def __init__(self,
+                 mel_filters: Optional[np.ndarray] = None,
+                 capacity_seconds: float = 30.0,
+                 sample_rate: int = 16000):
+        """Incremental log-mel extractor backed by a rolling frame buffer
+
+        Each pushed chunk is framed once (25 ms window, 10 ms hop); raw log10
+        mel frames and per-frame RMS are stored under a global frame index so
+        VAD, wake-word spotting and Whisper can all read the same frames.
+        """
+        self.sample_rate = sample_rate
+        self.mel_filters = mel_filters if mel_filters is not None else whisper_mel_filters(sample_rate=sample_rate)
+        self.n_mels = self.mel_filters.shape[1]
+        self.capacity = int(capacity_seconds * sample_rate / HOP_LENGTH)
+        self.window = np.hanning(N_FFT + 1)[:-1].astype(np.float32)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop all stored frames and pending samples"""
+        with self._lock:
+            self._log_mel = np.zeros((self.capacity, self.n_mels), dtype=np.float32)
+            self._rms = np.zeros(self.capacity, dtype=np.float32)
+            self._pending = np.zeros(0, dtype=np.float32)
+            self._started = False
+            self.n_samples = 0
+            self.n_frames = 0
+
+    @property
+    def first_frame(self) -> int:
+        """Oldest frame index still held in the buffer"""
+        return max(0, self.n_frames - self.capacity)
+
+    def frame_for_sample(self, sample: int) -> int:
+        """Frame index whose hop starts at or before the given sample index"""
+        return sample // HOP_LENGTH
+
+    def push(self, audio: np.ndarray) -> Tuple[int, int]:
+        """Add mono 16 kHz audio; returns the (start, end) range of new frames"""
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        with self._lock:
+            if not self._started:
+                if len(audio) == 0:
+                    return self.n_frames, self.n_frames
+                # Centre the first window on sample 0, like the batch extractor
+                pad = audio[1:N_FFT // 2 + 1][::-1]
+                pad = np.pad(pad, (N_FFT // 2 - len(pad), 0))
+                self._pending = pad
+                self._started = True
+            self.n_samples += len(audio)
+            self._pending = np.concatenate([self._pending, audio])
+
+            n_new = (len(self._pending) - N_FFT) // HOP_LENGTH + 1
+            start = self.n_frames
+            if n_new <= 0:
+                return start, start
+
+            frames = sliding_window_view(self._pending, N_FFT)[::HOP_LENGTH][:n_new]
+            spectrum = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2
+            mel = np.maximum(spectrum.astype(np.float32) @ self.mel_filters, 1e-10)
+            self._store(np.log10(mel), np.sqrt(np.mean(frames * frames, axis=1)))
+            self._pending = self._pending[n_new * HOP_LENGTH:]
+            return start, self.n_frames
+
+    def _store(self, log_mel: np.ndarray, rms: np.ndarray):
+        if len(log_mel) > self.capacity:
+            skipped = len(log_mel) - self.capacity
+            self.n_frames += skipped
+            log_mel, rms = log_mel[skipped:], rms[skipped:]
+        index = (self.n_frames + np.arange(len(log_mel))) % self.capacity
+        self._log_mel[index] = log_mel
+        self._rms[index] = rms
+        self.n_frames += len(log_mel)
+
+    def _indices(self, start: int, end: Optional[int]) -> np.ndarray:
+        end = self.n_frames if end is None else min(end, self.n_frames)
+        start = max(start, self.first_frame)
+        return np.arange(start, max(start, end)) % self.capacity
+
+    def log_mel(self, start: int, end: Optional[int] = None) -> np.ndarray:
+        """Raw log10-mel frames in [start, end) as (frames, n_mels)"""
+        with self._lock:
+            return self._log_mel[self._indices(start, end)]
+
+    def rms(self, start: int, end: Optional[int] = None) -> np.ndarray:
+        """Per-frame RMS in [start, end), for energy-based VAD"""
+        with self._lock:
+            return self._rms[self._indices(start, end)]
+
+    def whisper_input(self, start: int, end: Optional[int] = None) -> np.ndarray:
+        """Normalised (n_mels, 3000) Whisper encoder input for frames [start, end)"""
+        return normalize_log_mel(self.log_mel(start, end))
+
+
+def compute_log_mel(audio: np.ndarray, mel_filters: Optional[np.ndarray] = None) -> np.ndarray:
+    """One-shot raw log-mel frames for audio that is not part of a stream"""
+    cache = FeatureCache(mel_filters=mel_filters, capacity_seconds=max(1.0, len(audio) / 16000 + 1))
+    cache.push(audio)
+    return cache.log_mel(0)
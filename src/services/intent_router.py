@@ -0,0 +1,142 @@
+import re
+import time
+import threading
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Fillers stripped before matching so "iris, can you tell me the time please"
+# reduces to "the time"
+_PREFIX_RE = re.compile(
+    r"^(?:(?:hey|ok|okay|hi)\s+)?(?:iris\s+)?"
+    r"(?:(?:please|can you|could you|would you|do you know)\s+)*"
+    r"(?:(?:tell me|let me know|remind me)\s+)?")
+_SUFFIX_RE = re.compile(r"(?:\s+(?:please|iris|now|right now|thanks|thank you))+$")
+_PUNCT_RE = re.compile(r"[^\w\s']+")
+
+INTENT_PATTERNS = {
+    "time": r"what(?:'s| is) the (?:current )?time|what time (?:is it|it is)|(?:the )?(?:current )?time",
+    "date": r"what(?:'s| is) (?:the |today's )?(?:date|day)(?: today)?"
+            r"|what (?:day|date) (?:is (?:it|today)|it is)(?: today)?"
+            r"|what(?:'s| is) today|(?:today's |the )?date",
+    "timezone": r"what(?:'s| is) (?:my |the |our )?(?:current )?time ?zone"
+                r"|which time ?zone (?:am i|are we) in|(?:my |the )?time ?zone",
+    "stop": r"stop(?: it| that| talking)?|cancel(?: that)?|never ?mind|be quiet|quiet"
+            r"|shut up|that's all|forget it",
+    "repeat": r"repeat(?: that| yourself| the last answer| it)?|say (?:that|it) again"
+              r"|what did you (?:just )?say|come again|pardon",
+}
+
+# One alternation with a named group per intent, matched against the whole
+# normalised utterance so "what time is it in tokyo" is left to the LLM
+_INTENT_RE = re.compile(
+    "|".join(f"(?P<{name}>{pattern})" for name, pattern in INTENT_PATTERNS.items()))
+
+
+def normalize_utterance(text: str) -> str:
+    """Lowercase, drop punctuation, wake word and politeness fillers"""
+    text = " ".join(_PUNCT_RE.sub(" ", text.lower()).split())
+    text = _PREFIX_RE.sub("", text)
+    return _SUFFIX_RE.sub("", text).strip()
+
+
+class IntentRouter:
+    def __init__(self,
+                 handlers: Optional[Dict[str, Callable[[str], str]]] = None,
+                 classifier: Optional[Callable[[str], Tuple[str, float]]] = None,
+                 min_confidence: float = 0.85,
+                 on_stop: Optional[Callable[[], None]] = None):
+        """Answer deterministic intents locally before falling back to the LLM
+
+        ``handlers`` override the built-in responses per intent. ``classifier``
+        is an optional small model returning ``(intent, confidence)``; it is
+        only consulted when no pattern matches. ``on_stop`` is called for the
+        stop intent and should silence TTS and cancel pending generation.
+        """
+        self.handlers: Dict[str, Callable[[str], str]] = {
+            "time": lambda text: f"It's {datetime.now().strftime('%H:%M')}.",
+            "date": lambda text: f"Today is {datetime.now().strftime('%A, %B %d, %Y')}.",
+            "timezone": lambda text: f"Your time zone is {datetime.now().astimezone().tzname()}.",
+            "stop": self._stop,
+            "repeat": self._repeat,
+        }
+        if handlers:
+            self.handlers.update(handlers)
+        self.classifier = classifier
+        self.min_confidence = min_confidence
+        self.on_stop = on_stop
+        self.last_response: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "local": 0, "classifier": 0, "local_time_ms": 0.0}
+        self._intent_counts: Dict[str, int] = {}
+
+    def match(self, text: str) -> Optional[Tuple[str, str]]:
+        """Return ``(intent, source)`` for text, or None if the LLM is needed"""
+        normalized = normalize_utterance(text)
+        if not normalized:
+            return None
+        m = _INTENT_RE.fullmatch(normalized)
+        if m:
+            return m.lastgroup, "pattern"
+        if self.classifier is not None:
+            try:
+                intent, confidence = self.classifier(normalized)
+                if intent in self.handlers and confidence >= self.min_confidence:
+                    return intent, "classifier"
+            except Exception as e:
+                logger.error(f"Intent classifier error: {e}")
+        return None
+
+    def route(self, text: str) -> Optional[Dict]:
+        """Answer text locally if it is a known intent; None means use the LLM"""
+        start = time.perf_counter()
+        matched = self.match(text)
+        result = None
+        if matched is not None:
+            intent, source = matched
+            result = {
+                "intent": intent,
+                "source": source,
+                "response": self.handlers[intent](text),
+            }
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self._stats["requests"] += 1
+            if result is not None:
+                result["latency_ms"] = elapsed_ms
+                self._stats["local"] += 1
+                self._stats["local_time_ms"] += elapsed_ms
+                if result["source"] == "classifier":
+                    self._stats["classifier"] += 1
+                self._intent_counts[result["intent"]] = self._intent_counts.get(result["intent"], 0) + 1
+        return result
+
+    def remember(self, response: str):
+        """Record the last answer given to the user, for the repeat intent"""
+        self.last_response = response
+
+    def _stop(self, text: str) -> str:
+        if self.on_stop is not None:
+            try:
+                self.on_stop()
+            except Exception as e:
+                logger.error(f"Stop handler error: {e}")
+        return "Okay."
+
+    def _repeat(self, text: str) -> str:
+        if self.last_response:
+            return self.last_response
+        return "I haven't said anything yet."
+
+    def get_stats(self) -> Dict:
+        """Return routing counters and the share answered without a network call"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["intents"] = dict(self._intent_counts)
+        stats["local_share"] = stats["local"] / stats["requests"] if stats["requests"] else 0.0
+        stats["avg_local_ms"] = stats.pop("local_time_ms") / stats["local"] if stats["local"] else 0.0
+        return stats
@@ -0,0 +1,247 @@
+import os
+import time
+import asyncio
+import random
+import threading
+import logging
+import importlib.util
+from typing import Dict, Optional
+
+import httpx
+import openai
+
+logger = logging.getLogger(__name__)
+
+# Transient failures worth retrying; everything else is raised immediately
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LLMClient:
+    def __init__(self,
+                 api_key: Optional[str] = None,
+                 base_url: Optional[str] = None,
+                 max_connections: int = 20,
+                 max_keepalive: int = 10,
+                 keepalive_expiry: float = 60.0,
+                 max_concurrency: int = 8,
+                 max_retries: int = 3,
+                 backoff_base: float = 0.25,
+                 backoff_cap: float = 4.0,
+                 timeout: float = 30.0):
+        """Process-wide OpenAI access over tuned keep-alive connection pools
+
+        Sync callers share one pool and async callers another with the same
+        limits (httpx cannot share a pool between the two); async callers
+        should all run on one event loop. HTTP/2 is enabled when the ``h2``
+        package is installed. Sync and async calls share the
+        ``max_concurrency`` bound and are retried on transient errors with
+        full-jitter exponential backoff.
+        """
+        self.http2 = importlib.util.find_spec("h2") is not None
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self._http_client = openai.DefaultHttpxClient(limits=limits, http2=self.http2)
+        self._async_http_client = openai.DefaultAsyncHttpxClient(limits=limits, http2=self.http2)
+        # SDK retries are disabled so backoff happens in exactly one place
+        self.client = openai.OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            timeout=timeout,
+            http_client=self._http_client
+        )
+        self.async_client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            timeout=timeout,
+            http_client=self._async_http_client
+        )
+
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._last_activity = 0.0
+        self._warming = False
+        self._stats = {
+            "requests": 0,
+            "errors": 0,
+            "retries": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+            "queue_wait_s": 0.0,
+            "warmups": 0,
+        }
+
+    # Pre-warming
+    def warm(self):
+        """Open (or refresh) a pooled connection with a free metadata request"""
+        try:
+            self.client.models.list()
+            with self._lock:
+                self._stats["warmups"] += 1
+                self._last_activity = time.monotonic()
+        except Exception as e:
+            logger.warning(f"LLM connection warm-up failed: {e}")
+        finally:
+            with self._lock:
+                self._warming = False
+
+    def warm_in_background(self):
+        """Warm the pool without blocking the caller"""
+        with self._lock:
+            if self._warming:
+                return
+            self._warming = True
+        thread = threading.Thread(target=self.warm)
+        thread.daemon = True
+        thread.start()
+
+    def prewarm_if_idle(self):
+        """Re-warm when pooled connections have likely expired, e.g. on wake word"""
+        if time.monotonic() - self._last_activity > self.keepalive_expiry * 0.9:
+            self.warm_in_background()
+
+    # Calls
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def _begin(self, waited: float):
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["in_flight"] += 1
+            self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._stats["in_flight"])
+            self._stats["queue_wait_s"] += waited
+
+    def _end(self):
+        with self._lock:
+            self._stats["in_flight"] -= 1
+            self._last_activity = time.monotonic()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def chat_completion(self, **kwargs):
+        """Blocking ``chat.completions.create`` with concurrency bound and retries"""
+        start = time.monotonic()
+        with self._semaphore:
+            self._begin(time.monotonic() - start)
+            try:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        return self.client.chat.completions.create(**kwargs)
+                    except RETRYABLE_ERRORS as e:
+                        if attempt == self.max_retries:
+                            self._count("errors")
+                            raise
+                        self._count("retries")
+                        logger.warning(f"LLM request failed ({e}); retrying")
+                        time.sleep(self._backoff(attempt))
+                    except Exception:
+                        self._count("errors")
+                        raise
+            finally:
+                self._end()
+
+    async def _acquire_slot(self):
+        # The concurrency bound is a threading semaphore shared with sync
+        # callers; poll it so the event loop never blocks and a cancelled
+        # waiter cannot leave a slot taken
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(0.005)
+
+    async def achat_completion(self, **kwargs):
+        """Async ``chat.completions.create`` with the same bound and retries"""
+        start = time.monotonic()
+        await self._acquire_slot()
+        try:
+            self._begin(time.monotonic() - start)
+            try:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        return await self.async_client.chat.completions.create(**kwargs)
+                    except RETRYABLE_ERRORS as e:
+                        if attempt == self.max_retries:
+                            self._count("errors")
+                            raise
+                        self._count("retries")
+                        logger.warning(f"LLM request failed ({e}); retrying")
+                        await asyncio.sleep(self._backoff(attempt))
+                    except Exception:
+                        self._count("errors")
+                        raise
+            finally:
+                self._end()
+        finally:
+            self._semaphore.release()
+
+    def pool_state(self, async_pool: bool = False) -> Optional[Dict]:
+        """Connection counts read from the httpx transport's connection pool
+
+        Returns None if the transport does not expose an httpcore pool.
+        """
+        http_client = self._async_http_client if async_pool else self._http_client
+        pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+        if pool is None:
+            return None
+        connections = list(pool.connections)
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "connections": len(connections),
+            "active_connections": len(connections) - idle,
+            "idle_connections": idle,
+            "pool_utilisation": (len(connections) - idle) / self.max_connections,
+        }
+
+    def get_stats(self) -> Dict:
+        """Request counters, the concurrency bound's load and connection pool state"""
+        with self._lock:
+            stats = dict(self._stats)
+            idle = time.monotonic() - self._last_activity if self._last_activity else None
+        stats["http2"] = self.http2
+        stats["max_concurrency"] = self.max_concurrency
+        stats["max_connections"] = self.max_connections
+        # Share of max_concurrency slots taken; says nothing about sockets
+        stats["concurrency_utilisation"] = stats["in_flight"] / self.max_concurrency
+        stats["pool"] = self.pool_state()
+        stats["async_pool"] = self.pool_state(async_pool=True)
+        stats["idle_s"] = idle
+        return stats
+
+    def close(self):
+        self.client.close()
+
+    async def aclose(self):
+        await self.async_client.close()
+
+
+_shared_client: Optional[LLMClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_llm_client(api_key: Optional[str] = None) -> LLMClient:
+    """Return the process-wide LLM client, creating and warming it on first use"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = LLMClient(
+                api_key=api_key or os.getenv("OPENAI_API_KEY"),
+                max_concurrency=int(os.getenv("IRIS_LLM_CONCURRENCY", "8"))
+            )
+            _shared_client.warm_in_background()
+        return _shared_client
@@ -0,0 +1,237 @@
+import os
+import re
+import bisect
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional
+
+from .llm_client import LLMClient, get_llm_client
+
+logger = logging.getLogger(__name__)
+
+
+def default_tiers() -> List[str]:
+    """Model tiers ordered fastest to strongest, read when the router is built
+
+    Resolved lazily so overrides loaded by ``load_dotenv()`` after import are
+    honoured. Point ``OPENAI_BASE_URL`` at a local stub server (see
+    ``llm_router_test.py``) to exercise routing and hedging offline.
+    """
+    return [
+        os.getenv("IRIS_FAST_MODEL", "gpt-3.5-turbo"),
+        os.getenv("IRIS_STRONG_MODEL", "gpt-4"),
+    ]
+
+
+# Histogram bucket upper bounds in seconds (roughly logarithmic)
+LATENCY_BUCKETS = [0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 4.0,
+                   6.0, 8.0, 12.0, 16.0, 24.0, 32.0, 60.0]
+
+_COMPLEX_WORDS = re.compile(
+    r"\b(?:why|how|explain|compare|analy[sz]e|summari[sz]e|write|code|plan|"
+    r"describe|difference|pros|cons|recommend|step|calculate|translate)\b")
+
+
+class LatencyHistogram:
+    def __init__(self, buckets: Optional[List[float]] = None):
+        """Fixed-bucket latency histogram with interpolated quantiles"""
+        self.buckets = buckets or LATENCY_BUCKETS
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += 1
+            self.sum += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate quantile, or None when nothing has been recorded"""
+        with self._lock:
+            if not self.total:
+                return None
+            target = q * self.total
+            seen = 0
+            for i, count in enumerate(self.counts):
+                if count and seen + count >= target:
+                    lower = self.buckets[i - 1] if i > 0 else 0.0
+                    upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1] * 2
+                    return lower + (upper - lower) * (target - seen) / count
+                seen += count
+            return self.buckets[-1]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            total, mean = self.total, (self.sum / self.total if self.total else None)
+            counts = list(self.counts)
+        return {
+            "count": total,
+            "mean": mean,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], counts)),
+        }
+
+
+class LLMRouter:
+    def __init__(self,
+                 client: LLMClient,
+                 tiers: Optional[List[str]] = None,
+                 latency_budget: float = 4.0,
+                 request_timeout: float = 30.0,
+                 hedge: bool = True,
+                 default_hedge_after: float = 3.0,
+                 min_samples: int = 20,
+                 complexity_threshold: int = 2,
+                 max_workers: int = 8):
+        """Pick a model tier per request and hedge slow calls to a faster tier
+
+        Short chit-chat goes to the fastest tier, complex questions to the
+        strongest tier whose p95 latency fits ``latency_budget``. If the
+        primary request has not answered by its p95 (or
+        ``default_hedge_after`` until ``min_samples`` are recorded), a backup
+        request is sent to the next faster tier and the first answer wins.
+        Requests already on the fastest tier are never hedged: a duplicate to
+        the same model would only add load.
+        """
+        self.client = client
+        self.tiers = tiers or default_tiers()
+        self.latency_budget = latency_budget
+        self.request_timeout = request_timeout
+        self.hedge = hedge
+        self.default_hedge_after = default_hedge_after
+        self.min_samples = min_samples
+        self.complexity_threshold = complexity_threshold
+        self.histograms = {model: LatencyHistogram() for model in self.tiers}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-router")
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "errors": 0, "timeouts": 0}
+        self._routed = {model: 0 for model in self.tiers}
+
+    @staticmethod
+    def complexity(text: str) -> int:
+        """Rough utterance complexity score: length, clauses and task words"""
+        lowered = text.lower()
+        words = len(lowered.split())
+        score = (words > 12) + (words > 30)
+        score += min(2, len(_COMPLEX_WORDS.findall(lowered)))
+        score += lowered.count("?") > 1 or " and " in lowered
+        return score
+
+    def choose_model(self, text: str, latency_budget: Optional[float] = None) -> int:
+        """Index of the tier to use for ``text``"""
+        budget = self.latency_budget if latency_budget is None else latency_budget
+        if self.complexity(text) < self.complexity_threshold:
+            return 0
+        # Strongest tier whose observed p95 fits the budget
+        for index in range(len(self.tiers) - 1, 0, -1):
+            histogram = self.histograms[self.tiers[index]]
+            p95 = histogram.quantile(0.95) if histogram.total >= self.min_samples else None
+            if p95 is None or p95 <= budget:
+                return index
+        return 0
+
+    def hedge_deadline(self, model: str) -> float:
+        histogram = self.histograms[model]
+        if histogram.total < self.min_samples:
+            return self.default_hedge_after
+        return histogram.quantile(0.95)
+
+    def _call(self, model: str, messages: List[Dict], **kwargs):
+        start = time.monotonic()
+        try:
+            response = self.client.chat_completion(
+                model=model,
+                messages=messages,
+                timeout=self.request_timeout,
+                **kwargs
+            )
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        self.histograms[model].record(time.monotonic() - start)
+        return response
+
+    def complete(self, messages: List[Dict], text: Optional[str] = None,
+                 latency_budget: Optional[float] = None, **kwargs):
+        """Chat completion routed by complexity; returns the API response"""
+        if text is None:
+            text = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        index = self.choose_model(text, latency_budget)
+        primary = self.tiers[index]
+        with self._lock:
+            self._stats["requests"] += 1
+            self._routed[primary] += 1
+
+        # The hard timeout runs from the start of the call, hedge delay included
+        deadline = time.monotonic() + self.request_timeout
+        first = self._executor.submit(self._call, primary, messages, **kwargs)
+        futures = [first]
+        if self.hedge and index > 0:
+            done, _ = wait(futures, timeout=min(self.hedge_deadline(primary),
+                                                self.request_timeout))
+            if not done:
+                backup = self.tiers[index - 1]
+                logger.info(f"Hedging {primary} request to {backup}")
+                with self._lock:
+                    self._stats["hedged"] += 1
+                futures.append(self._executor.submit(self._call, backup, messages, **kwargs))
+
+        pending = set(futures)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                raise TimeoutError(f"No LLM response within {self.request_timeout}s")
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        with self._lock:
+                            self._stats["hedge_wins"] += 1
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def get_stats(self) -> Dict:
+        """Routing/hedging counters and per-model latency histograms"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["routed"] = dict(self._routed)
+        stats["latency"] = {model: histogram.snapshot() for model, histogram in self.histograms.items()}
+        return stats
+
+    def close(self):
+        """Stop the request threads; queued calls are cancelled"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_shared_router: Optional[LLMRouter] = None
+_shared_lock = threading.Lock()
+
+
+def get_llm_router() -> LLMRouter:
+    """Return the process-wide router, so latency histograms are shared"""
+    global _shared_router
+    with _shared_lock:
+        if _shared_router is None:
+            _shared_router = LLMRouter(get_llm_client())
+        return _shared_router
+
+
+def close_llm_router():
+    """Close the process-wide router on shutdown; the next get builds a new one"""
+    global _shared_router
+    with _shared_lock:
+        if _shared_router is not None:
+            _shared_router.close()
+            _shared_router = None
@@ -0,0 +1,162 @@
+import os
+import json
+import asyncio
+import time
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+
+from src.services.llm_client import LLMClient
+from src.services.llm_router import LLMRouter, default_tiers
+
+FAST, STRONG = "stub-fast", "stub-strong"
+SIMPLE = "hello there"
+COMPLEX = "explain how tides work and compare them with waves"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible chat endpoint with a per-model delay"""
+
+    # Keep-alive, like the real API, so pooled connections are reused
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        model = body["model"]
+        self.server.calls.append(model)
+        time.sleep(self.server.delays.get(model, 0.0))
+        self._reply({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"reply from {model}"},
+                "finish_reason": "stop",
+            }],
+        })
+
+    def do_GET(self):
+        self._reply({"object": "list", "data": []})
+
+    def _reply(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class LLMRouterStubServerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self.server.daemon_threads = True
+        self.server.calls = []
+        self.server.delays = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        self.client = LLMClient(api_key="test", base_url=base_url, max_retries=0)
+        self.routers = []
+
+    def tearDown(self):
+        for router in self.routers:
+            router.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.client.close()
+
+    def router(self, **kwargs):
+        kwargs.setdefault("default_hedge_after", 0.1)
+        router = LLMRouter(self.client, tiers=[FAST, STRONG], **kwargs)
+        self.routers.append(router)
+        return router
+
+    def complete(self, router, text):
+        response = router.complete([{"role": "user", "content": text}])
+        return response.choices[0].message.content
+
+    def test_routes_by_complexity(self):
+        router = self.router()
+        self.assertEqual(self.complete(router, SIMPLE), f"reply from {FAST}")
+        self.assertEqual(self.complete(router, COMPLEX), f"reply from {STRONG}")
+        self.assertEqual(router.get_stats()["routed"], {FAST: 1, STRONG: 1})
+
+    def test_slow_strong_tier_is_hedged_to_fast_tier(self):
+        self.server.delays[STRONG] = 1.0
+        router = self.router()
+        self.assertEqual(self.complete(router, COMPLEX), f"reply from {FAST}")
+        stats = router.get_stats()
+        self.assertEqual(stats["hedged"], 1)
+        self.assertEqual(stats["hedge_wins"], 1)
+        self.assertEqual(self.server.calls, [STRONG, FAST])
+
+    def test_fast_tier_is_never_hedged(self):
+        self.server.delays[FAST] = 0.3
+        router = self.router()
+        self.assertEqual(self.complete(router, SIMPLE), f"reply from {FAST}")
+        self.assertEqual(router.get_stats()["hedged"], 0)
+        self.assertEqual(self.server.calls, [FAST])
+
+    def test_timeout_counts_from_the_start_of_the_call(self):
+        self.server.delays[STRONG] = self.server.delays[FAST] = 2.0
+        router = self.router(default_hedge_after=0.3, request_timeout=0.6)
+        start = time.monotonic()
+        with self.assertRaises((TimeoutError, openai.APITimeoutError)):
+            self.complete(router, COMPLEX)
+        # Not 0.6s after the hedge fired at 0.3s
+        self.assertLess(time.monotonic() - start, 0.8)
+
+    def test_client_reports_connection_pool_state(self):
+        self.complete(self.router(), SIMPLE)
+        pool = self.client.get_stats()["pool"]
+        self.assertEqual(pool["connections"], 1)
+        self.assertEqual(pool["idle_connections"], 1)
+        self.assertEqual(pool["pool_utilisation"], 0.0)
+
+    def test_async_calls_share_the_concurrency_bound(self):
+        self.server.delays[FAST] = 0.2
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        client = LLMClient(api_key="test", base_url=base_url, max_concurrency=2)
+
+        async def run():
+            try:
+                responses = await asyncio.gather(*[
+                    client.achat_completion(model=FAST, messages=[{"role": "user", "content": SIMPLE}])
+                    for _ in range(4)
+                ])
+                return responses, client.pool_state(async_pool=True)
+            finally:
+                await client.aclose()
+
+        responses, pool = asyncio.run(run())
+        client.close()
+        self.assertEqual([r.choices[0].message.content for r in responses], [f"reply from {FAST}"] * 4)
+        stats = client.get_stats()
+        self.assertEqual(stats["requests"], 4)
+        self.assertEqual(stats["peak_in_flight"], 2)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(pool["connections"], 2)
+        self.assertEqual(pool["idle_connections"], 2)
+
+    def test_tiers_are_read_when_the_router_is_built(self):
+        previous = os.environ.get("IRIS_FAST_MODEL")
+        os.environ["IRIS_FAST_MODEL"] = "late-override"
+        try:
+            self.assertEqual(default_tiers()[0], "late-override")
+            self.assertEqual(LLMRouter(self.client).tiers[0], "late-override")
+        finally:
+            if previous is None:
+                del os.environ["IRIS_FAST_MODEL"]
+            else:
+                os.environ["IRIS_FAST_MODEL"] = previous
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .audio_frontend import TARGET_SAMPLE_RATE
+from .decoding import generate_kwargs
+
+logger = logging.getLogger(__name__)
+
+
+def find_split_points(audio: np.ndarray,
+                      sample_rate: int = TARGET_SAMPLE_RATE,
+                      max_chunk: float = 28.0,
+                      min_chunk: float = 10.0,
+                      min_silence: float = 0.3,
+                      overlap: float = 1.0) -> List[Tuple[int, int]]:
+    """Split audio into (start, end) sample ranges at detected silences
+
+    Each chunk is at most ``max_chunk`` seconds (Whisper's window is 30 s).
+    The cut goes in the middle of the longest silence between ``min_chunk``
+    and ``max_chunk``; if there is none, the chunk is cut hard and the next
+    one starts ``overlap`` seconds earlier so words on the boundary survive.
+    """
+    hop = sample_rate // 100
+    n_frames = len(audio) // hop
+    if n_frames == 0:
+        return [(0, len(audio))] if len(audio) else []
+    frames = audio[:n_frames * hop].reshape(n_frames, hop)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    # Relative to the background level, but never above a quarter of the
+    # loud level so mostly-speech recordings still find their pauses
+    threshold = max(1e-4, min(3.0 * float(np.percentile(rms, 10)),
+                              0.25 * float(np.percentile(rms, 90))))
+    silent = rms < threshold
+
+    # Start/end frames of silence runs long enough to cut in
+    edges = np.diff(np.concatenate([[0], silent.astype(np.int8), [0]]))
+    runs = [(s, e) for s, e in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))
+            if (e - s) * hop >= min_silence * sample_rate]
+    cuts = [int((s + e) // 2 * hop) for s, e in runs]
+    lengths = {cut: e - s for cut, (s, e) in zip(cuts, runs)}
+
+    chunks = []
+    start = 0
+    max_len, min_len = int(max_chunk * sample_rate), int(min_chunk * sample_rate)
+    while len(audio) - start > max_len:
+        candidates = [c for c in cuts if start + min_len <= c <= start + max_len]
+        if candidates:
+            cut = max(candidates, key=lambda c: lengths[c])
+            chunks.append((start, cut))
+            start = cut
+        else:
+            cut = start + max_len
+            chunks.append((start, cut))
+            start = cut - int(overlap * sample_rate)
+    chunks.append((start, len(audio)))
+    return chunks
+
+
+def merge_overlap(previous: str, current: str, max_words: int = 12) -> str:
+    """Drop the words at the start of ``current`` that repeat the end of ``previous``"""
+    prev_words = previous.split()
+    words = current.split()
+
+    def norm(word):
+        return word.strip(".,!?;:").lower()
+
+    for size in range(min(max_words, len(prev_words), len(words)), 0, -1):
+        if [norm(w) for w in prev_words[-size:]] == [norm(w) for w in words[:size]]:
+            return " ".join(words[size:])
+    return current
+
+
+# Intra-op threads per worker process by default. Chunks are independent, so
+# extra cores go to more workers rather than more threads per model. Each
+# worker holds its own model; hosts short on memory should set IRIS_ASR_WORKERS
+THREADS_PER_WORKER = 2
+
+
+def default_workers() -> int:
+    """Worker processes for this host: ``IRIS_ASR_WORKERS`` or one per
+    ``THREADS_PER_WORKER`` cores, so throughput grows with the core count"""
+    override = os.getenv("IRIS_ASR_WORKERS")
+    if override:
+        return max(1, int(override))
+    return max(1, (os.cpu_count() or 1) // THREADS_PER_WORKER)
+
+
+_worker_pipeline = None
+
+
+def _init_worker(model: str, threads: int):
+    """Load one Whisper pipeline per worker process"""
+    global _worker_pipeline
+    import torch
+    from .runtime_config import create_pipeline
+    _worker_pipeline = create_pipeline("automatic-speech-recognition", model=model, device="cpu")
+    # Workers split the cores between them instead of using the host profile
+    torch.set_num_threads(threads)
+
+
+def _transcribe_in_worker(index: int, audio: np.ndarray, profile: str) -> Tuple[int, str]:
+    result = _worker_pipeline({"raw": audio, "sampling_rate": TARGET_SAMPLE_RATE},
+                              generate_kwargs=generate_kwargs(profile))
+    return index, result["text"]
+
+
+class LongFormTranscriber:
+    def __init__(self,
+                 pipeline=None,
+                 model: str = "openai/whisper-base",
+                 workers: Optional[int] = None,
+                 max_chunk: float = 28.0):
+        """Parallel chunked transcription for multi-minute recordings
+
+        With ``workers > 1`` (the default on hosts with four or more cores)
+        chunks are spread over a process pool where each worker holds its own
+        model and an equal share of the CPU cores, so throughput scales with
+        core count. Workers start on demand, so short files do not load more
+        models than they have chunks. Otherwise ``pipeline`` is used
+        in-process.
+        """
+        self.pipeline = pipeline
+        self.model = model
+        self.workers = workers if workers is not None else default_workers()
+        self.max_chunk = max_chunk
+        self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.model, threads)
+            )
+        return self._pool
+
+    def _transcribe_local(self, index: int, audio: np.ndarray, profile: str) -> Tuple[int, str]:
+        result = self.pipeline({"raw": audio, "sampling_rate": TARGET_SAMPLE_RATE},
+                               generate_kwargs=generate_kwargs(profile))
+        return index, result["text"]
+
+    def transcribe(self, audio: np.ndarray,
+                   on_progress: Optional[Callable[[Dict], None]] = None,
+                   profile: str = "dictation") -> Dict:
+        """Transcribe mono 16 kHz audio; returns merged text and segments
+
+        ``on_progress`` receives an event per finished chunk with ``done``,
+        ``total`` and the chunk's ``segment``. ``profile`` names the decoding
+        profile used for every chunk.
+        """
+        chunks = find_split_points(audio, max_chunk=self.max_chunk)
+        if self.workers > 1:
+            executor = self._get_pool()
+            submit = lambda i, a: executor.submit(_transcribe_in_worker, i, a, profile)
+        else:
+            executor = ThreadPoolExecutor(max_workers=1)
+            submit = lambda i, a: executor.submit(self._transcribe_local, i, a, profile)
+
+        texts: Dict[int, str] = {}
+        futures = [submit(i, audio[start:end]) for i, (start, end) in enumerate(chunks)]
+        try:
+            for future in as_completed(futures):
+                index, text = future.result()
+                texts[index] = text.strip()
+                if on_progress:
+                    start, end = chunks[index]
+                    on_progress({
+                        "done": len(texts),
+                        "total": len(chunks),
+                        "segment": {
+                            "index": index,
+                            "start": start / TARGET_SAMPLE_RATE,
+                            "end": end / TARGET_SAMPLE_RATE,
+                            "text": texts[index],
+                        },
+                    })
+        finally:
+            if self.workers <= 1:
+                executor.shutdown(wait=False)
+
+        segments = []
+        merged = ""
+        previous_end = 0
+        for index, (start, end) in enumerate(chunks):
+            text = texts[index]
+            if start < previous_end:
+                text = merge_overlap(merged, text)
+            merged = f"{merged} {text}".strip() if text else merged
+            previous_end = end
+            segments.append({
+                "start": start / TARGET_SAMPLE_RATE,
+                "end": end / TARGET_SAMPLE_RATE,
+                "text": text,
+            })
+        return {"text": merged, "segments": segments}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import socket
+import argparse
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PATH = os.getenv("IRIS_RUNTIME_PROFILE", os.path.expanduser("~/.iris_runtime_profile.json"))
+
+ASR_MODEL = "openai/whisper-base"
+
+
+def default_profile() -> Dict:
+    """Conservative defaults: leave headroom so ASR and emotion can overlap"""
+    cores = os.cpu_count() or 1
+    return {
+        "intra_op_threads": max(1, cores // 2),
+        "interop_threads": 1,
+        "emotion_batch_size": 16,
+    }
+
+
+def load_profile(path: str = PROFILE_PATH) -> Dict:
+    """Defaults overlaid with the host profile written by ``autotune``"""
+    profile = default_profile()
+    try:
+        with open(path) as f:
+            profile.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable runtime profile {path}: {e}")
+    return profile
+
+
+_applied: Optional[Dict] = None
+_apply_lock = threading.Lock()
+
+
+def apply_runtime_config(path: str = PROFILE_PATH) -> Dict:
+    """Apply torch thread settings once per process and return the profile"""
+    global _applied
+    with _apply_lock:
+        if _applied is not None:
+            return _applied
+        import torch
+        profile = load_profile(path)
+        torch.set_num_threads(int(profile["intra_op_threads"]))
+        try:
+            torch.set_num_interop_threads(int(profile["interop_threads"]))
+        except RuntimeError:
+            # Only settable before the first parallel op in the process
+            logger.warning("Interop threads already initialised; keeping current setting")
+        logger.info(f"Runtime profile: {profile['intra_op_threads']} intra-op / "
+                    f"{profile['interop_threads']} interop threads")
+        _applied = profile
+        return profile
+
+
+def inference_mode():
+    """Context manager for all direct model calls (no autograd bookkeeping)"""
+    import torch
+    return torch.inference_mode()
+
+
+class InferencePipeline:
+    """Transformers pipeline whose every call runs under ``inference_mode``
+
+    Attribute access (``model``, ``feature_extractor``, ...) is forwarded to
+    the wrapped pipeline.
+    """
+
+    def __init__(self, pipe):
+        self.pipeline = pipe
+
+    def __call__(self, *args, **kwargs):
+        with inference_mode():
+            return self.pipeline(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.pipeline, name)
+
+
+def create_pipeline(task: str, model: str, device=None, **kwargs) -> InferencePipeline:
+    """Build a transformers pipeline with the runtime profile applied"""
+    from transformers import pipeline
+    apply_runtime_config()
+    pipe = pipeline(task, model=model, device=device, **kwargs)
+    pipe.model.eval()
+    return InferencePipeline(pipe)
+
+
+# Autotuning
+def _load_fixture(path: Optional[str]) -> np.ndarray:
+    from .audio_frontend import prepare_audio, TARGET_SAMPLE_RATE
+    if path is None:
+        # Speech-band noise stands in when no fixture recording is given
+        rng = np.random.default_rng(0)
+        return (0.1 * rng.standard_normal(5 * TARGET_SAMPLE_RATE)).astype(np.float32)
+    import soundfile as sf
+    audio, sample_rate = sf.read(path, dtype="float32")
+    return prepare_audio(audio, sample_rate)
+
+
+def _time(fn, repeats: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def _time_concurrently(asr_fn, emotion_fn, threads: int, repeats: int):
+    """Time ASR calls while emotion calls run back to back on another thread
+
+    Both run at once, as they do in the services, so a thread count that
+    oversubscribes the cores shows up as a slower ASR realtime factor.
+    Returns mean seconds per ASR call and per emotion call.
+    """
+    import torch
+    stop = threading.Event()
+    emotion_times: List[float] = []
+
+    def background():
+        # Threads pick up the intra-op setting per thread, so set it here too
+        torch.set_num_threads(threads)
+        while True:
+            start = time.perf_counter()
+            emotion_fn()
+            emotion_times.append(time.perf_counter() - start)
+            if stop.is_set():
+                break
+
+    torch.set_num_threads(threads)
+    emotion_fn()  # warm-up before the contended run
+    worker = threading.Thread(target=background)
+    worker.start()
+    try:
+        asr_time = _time(asr_fn, repeats)
+    finally:
+        stop.set()
+        worker.join()
+    return asr_time, float(np.mean(emotion_times))
+
+
+def autotune(fixture: Optional[str] = None,
+             thread_counts: Optional[List[int]] = None,
+             batch_sizes: Optional[List[int]] = None,
+             repeats: int = 3,
+             path: str = PROFILE_PATH) -> Dict:
+    """Sweep thread counts and emotion batch sizes on fixture audio; write the best profile
+
+    Whisper and the emotion classifier are timed running concurrently, so
+    the chosen ``intra_op_threads`` is the fastest setting for ASR while
+    emotion work competes for the same cores, not the single-stream optimum.
+    """
+    import torch
+    from transformers import pipeline
+    from .audio_frontend import TARGET_SAMPLE_RATE
+    from .emotion_service import EMOTION_MODEL
+
+    cores = os.cpu_count() or 1
+    thread_counts = thread_counts or sorted({t for t in (1, 2, 4, 8, 12, 16, 24, 32, cores) if t <= cores})
+    batch_sizes = batch_sizes or [1, 2, 4, 8]
+    audio = _load_fixture(fixture)
+    texts = ["what's the weather like today", "I am so happy to see you",
+             "this is really frustrating", "can you remind me about the meeting"]
+
+    torch.set_num_interop_threads(1)
+    asr = InferencePipeline(pipeline("automatic-speech-recognition", model=ASR_MODEL, device="cpu"))
+    emotion = InferencePipeline(pipeline("text-classification", model=EMOTION_MODEL, device="cpu"))
+    audio_seconds = len(audio) / TARGET_SAMPLE_RATE
+    clip = {"raw": audio, "sampling_rate": TARGET_SAMPLE_RATE}
+
+    measurements = []
+    for threads in thread_counts:
+        for batch in batch_sizes:
+            batch_texts = texts * batch
+            asr_time, emotion_time = _time_concurrently(
+                lambda: asr(clip),
+                lambda: emotion(batch_texts, batch_size=len(batch_texts)),
+                threads, repeats)
+            result = {
+                "threads": threads,
+                "emotion_batch_size": len(batch_texts),
+                "asr_realtime_factor": asr_time / audio_seconds,
+                "emotion_ms_per_text": 1000 * emotion_time / len(batch_texts),
+            }
+            logger.info(f"autotune: {result}")
+            measurements.append(result)
+
+    best_threads = min(measurements, key=lambda m: m["asr_realtime_factor"])["threads"]
+    best_emotion = min((m for m in measurements if m["threads"] == best_threads),
+                       key=lambda m: m["emotion_ms_per_text"])
+    profile = {
+        "host": socket.gethostname(),
+        "cpu_count": cores,
+        "intra_op_threads": best_threads,
+        "interop_threads": 1,
+        "emotion_batch_size": best_emotion["emotion_batch_size"],
+        "measurements": measurements,
+    }
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+    logger.info(f"Wrote runtime profile to {path}")
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IRIS runtime configuration")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    tune = subparsers.add_parser("autotune", help="benchmark this host and write the best profile")
+    tune.add_argument("--fixture", help="audio file to benchmark on (default: synthetic noise)")
+    tune.add_argument("--threads", type=int, nargs="+", help="thread counts to try")
+    tune.add_argument("--batch-sizes", type=int, nargs="+", help="batch sizes to try")
+    tune.add_argument("--repeats", type=int, default=3)
+    tune.add_argument("--output", default=PROFILE_PATH)
+    subparsers.add_parser("show", help="print the profile that will be applied")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "autotune":
+        profile = autotune(args.fixture, args.threads, args.batch_sizes, args.repeats, args.output)
+        profile.pop("measurements")
+        print(json.dumps(profile, indent=2))
+    else:
+        print(json.dumps(load_profile(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
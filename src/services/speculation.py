@@ -0,0 +1,131 @@
+import re
+import time
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_PUNCT_RE = re.compile(r"[^\w\s']+")
+
+
+def normalize_transcript(text: str) -> str:
+    """Case/punctuation-insensitive form used to compare transcripts"""
+    return " ".join(_PUNCT_RE.sub(" ", text.lower()).split())
+
+
+class SpeculativeResponder:
+    def __init__(self,
+                 generate: Callable[[str, Dict], str],
+                 stability_interval: float = 0.6,
+                 max_workers: int = 2):
+        """Start the LLM request early once the partial transcript is stable
+
+        ``generate(text, usage)`` produces the response and may fill
+        ``usage["total_tokens"]`` so discarded requests can be accounted for.
+        """
+        self.generate = generate
+        self.stability_interval = stability_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative-llm")
+        self._lock = threading.Lock()
+        self._stats = {
+            "fired": 0,
+            "hits": 0,
+            "misses": 0,
+            "cancelled": 0,
+            "wasted_tokens": 0,
+            "used_tokens": 0,
+        }
+        self.reset()
+
+    def reset(self):
+        """Forget the current utterance, discarding any in-flight speculation"""
+        with self._lock:
+            pending = getattr(self, "_future", None)
+            self._partial: Optional[str] = None
+            self._partial_since = 0.0
+            self._speculated: Optional[str] = None
+            self._future: Optional[Future] = None
+        if pending is not None:
+            self._discard(pending)
+
+    def observe_partial(self, text: str, now: Optional[float] = None):
+        """Feed the latest partial transcript; fires a request once it is stable"""
+        now = time.monotonic() if now is None else now
+        key = normalize_transcript(text)
+        if not key:
+            return
+        with self._lock:
+            if key != self._partial:
+                self._partial = key
+                self._partial_since = now
+                return
+            if key == self._speculated or now - self._partial_since < self.stability_interval:
+                return
+            stale = self._future
+            self._speculated = key
+            self._future = self._executor.submit(self._run, text)
+            self._stats["fired"] += 1
+        if stale is not None:
+            self._discard(stale)
+
+    def resolve(self, final_text: str) -> Optional[str]:
+        """Return the speculative response if it was made for ``final_text``
+
+        Returns None when there is no matching speculation; the caller then
+        issues the request itself. A mismatching request is cancelled.
+        """
+        with self._lock:
+            future, speculated = self._future, self._speculated
+            self._future = None
+            self._speculated = None
+            self._partial = None
+        if future is None:
+            return None
+        if speculated != normalize_transcript(final_text):
+            self._count("misses")
+            self._discard(future)
+            return None
+
+        try:
+            response, tokens = future.result()
+        except Exception as e:
+            logger.error(f"Speculative request failed: {e}")
+            self._count("misses")
+            return None
+        self._count("hits")
+        self._count("used_tokens", tokens)
+        return response
+
+    def _run(self, text: str):
+        usage: Dict = {}
+        response = self.generate(text, usage)
+        return response, usage.get("total_tokens", 0)
+
+    def _discard(self, future: Future):
+        """Cancel a speculation, or account its tokens as wasted when it lands"""
+        if future.cancel():
+            self._count("cancelled")
+            return
+
+        def on_done(done: Future):
+            if not done.cancelled() and done.exception() is None:
+                self._count("wasted_tokens", done.result()[1])
+        future.add_done_callback(on_done)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def get_stats(self) -> Dict:
+        """Return hit rate and token counters"""
+        with self._lock:
+            stats = dict(self._stats)
+        resolved = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / resolved if resolved else 0.0
+        return stats
+
+    def shutdown(self):
+        self.reset()
+        self._executor.shutdown(wait=False)